@@ -0,0 +1,36 @@
+"""Usage rollups
+
+Revision ID: 4b8e0d2f6a15
+Revises: 9f2c4a7d1e03
+Create Date: 2026-10-18 10:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8e0d2f6a15'
+down_revision = '9f2c4a7d1e03'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'usagerollups',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('api_key', sqlalchemy_utils.types.uuid.UUIDType(binary=False), nullable=False),
+        sa.Column('granularity', sa.VARCHAR(length=4), nullable=False),
+        sa.Column('bucket_start', sa.TIMESTAMP(), nullable=False),
+        sa.Column('requests', sa.BigInteger(), server_default='0', nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_usagerollups_api_key_bucket_start', 'usagerollups',
+                    ['api_key', 'bucket_start', 'granularity'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_usagerollups_api_key_bucket_start', table_name='usagerollups')
+    op.drop_table('usagerollups')
@@ -0,0 +1,39 @@
+"""Native enums for project mode and network
+
+Revision ID: 5e0f8c2a4b97
+Revises: c71a3e9b5d28
+Create Date: 2026-10-18 10:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0f8c2a4b97'
+down_revision = 'c71a3e9b5d28'
+branch_labels = None
+depends_on = None
+
+project_mode = postgresql.ENUM('full', 'archived', name='project_mode', create_type=False)
+project_network = postgresql.ENUM('mainnet', 'testnet', name='project_network', create_type=False)
+
+
+def upgrade():
+    op.execute("CREATE TYPE project_mode AS ENUM ('full', 'archived')")
+    op.execute("CREATE TYPE project_network AS ENUM ('mainnet', 'testnet')")
+    op.alter_column('projects', 'mode', type_=project_mode, existing_nullable=False,
+                    postgresql_using='mode::project_mode')
+    op.alter_column('projects', 'network', type_=project_network, existing_nullable=False,
+                    postgresql_using='network::project_network')
+
+
+def downgrade():
+    op.alter_column('projects', 'network', type_=sa.VARCHAR(length=7), existing_nullable=False,
+                    postgresql_using='network::text')
+    op.alter_column('projects', 'mode', type_=sa.VARCHAR(length=8), existing_nullable=False,
+                    postgresql_using='mode::text')
+    op.execute("DROP TYPE project_network")
+    op.execute("DROP TYPE project_mode")
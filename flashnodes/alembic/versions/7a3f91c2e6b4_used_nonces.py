@@ -0,0 +1,31 @@
+"""Used nonces
+
+Revision ID: 7a3f91c2e6b4
+Revises: d84b2e7c1f60
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3f91c2e6b4'
+down_revision = 'd84b2e7c1f60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'usednonces',
+        sa.Column('token', sa.VARCHAR(length=64), nullable=False),
+        sa.Column('expires_at', sa.TIMESTAMP(), nullable=False),
+        sa.PrimaryKeyConstraint('token')
+    )
+    op.create_index('ix_usednonces_expires_at', 'usednonces', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_usednonces_expires_at', table_name='usednonces')
+    op.drop_table('usednonces')
@@ -0,0 +1,80 @@
+"""Baseline schema
+
+Revision ID: 9f2c4a7d1e03
+Revises:
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision = '9f2c4a7d1e03'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('full_name', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('is_superuser', sa.Boolean(), nullable=True),
+        sa.Column('hashed_password', sa.VARCHAR(length=256), nullable=True),
+        sa.Column('public_address', sa.VARCHAR(length=64), nullable=False),
+        sa.Column('nonce', sa.VARCHAR(length=64), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('public_address')
+    )
+    op.create_index(op.f('ix_user_email'), 'user', ['email'], unique=True)
+    op.create_index(op.f('ix_user_full_name'), 'user', ['full_name'], unique=False)
+    op.create_index(op.f('ix_user_id'), 'user', ['id'], unique=False)
+    op.create_table(
+        'cryptocurrencies',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('full_name', sa.VARCHAR(length=64), nullable=False),
+        sa.Column('symbol', sa.VARCHAR(length=12), nullable=False),
+        sa.Column('details', sa.TEXT(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('symbol')
+    )
+    op.create_index(op.f('ix_cryptocurrencies_id'), 'cryptocurrencies', ['id'], unique=False)
+    op.create_table(
+        'projects',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('node_id', sqlalchemy_utils.types.uuid.UUIDType(binary=False),
+                  server_default=sa.text('gen_random_uuid()'), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('cryptocurrency_symbol', sa.VARCHAR(length=12), nullable=True),
+        sa.Column('status', sa.VARCHAR(length=9), server_default='pending', nullable=False),
+        sa.Column('mode', sa.VARCHAR(length=8), nullable=False),
+        sa.Column('network', sa.VARCHAR(length=7), nullable=False),
+        sa.Column('is_paid', sa.BOOLEAN(), server_default=sa.false(), nullable=False),
+        sa.Column('paid_until', sa.TIMESTAMP(), nullable=True),
+        sa.Column('created_on', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('api_key', sqlalchemy_utils.types.uuid.UUIDType(binary=False),
+                  server_default=sa.text('gen_random_uuid()'), nullable=False),
+        sa.Column('prefix', sa.VARCHAR(length=8), nullable=False),
+        sa.ForeignKeyConstraint(['cryptocurrency_symbol'], ['cryptocurrencies.symbol'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_projects_id'), 'projects', ['id'], unique=False)
+    op.create_index(op.f('ix_projects_node_id'), 'projects', ['node_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_projects_node_id'), table_name='projects')
+    op.drop_index(op.f('ix_projects_id'), table_name='projects')
+    op.drop_table('projects')
+    op.drop_index(op.f('ix_cryptocurrencies_id'), table_name='cryptocurrencies')
+    op.drop_table('cryptocurrencies')
+    op.drop_index(op.f('ix_user_id'), table_name='user')
+    op.drop_index(op.f('ix_user_full_name'), table_name='user')
+    op.drop_index(op.f('ix_user_email'), table_name='user')
+    op.drop_table('user')
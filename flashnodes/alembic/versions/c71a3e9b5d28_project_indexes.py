@@ -0,0 +1,34 @@
+"""Project lookup indexes
+
+Revision ID: c71a3e9b5d28
+Revises: 4b8e0d2f6a15
+Create Date: 2026-10-18 10:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision = 'c71a3e9b5d28'
+down_revision = '4b8e0d2f6a15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index('ix_projects_node_id', table_name='projects')
+    op.create_index('ix_projects_node_id', 'projects', ['node_id'], unique=True)
+    op.create_index('ix_projects_api_key', 'projects', ['api_key'], unique=True)
+    # Leading user_id serves owner lookups, api_key lets key lookups skip the table
+    op.create_index('ix_projects_user_id_api_key', 'projects', ['user_id', 'api_key'], unique=False)
+    op.create_index('ix_projects_status_paid_until', 'projects', ['status', 'paid_until'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_projects_status_paid_until', table_name='projects')
+    op.drop_index('ix_projects_user_id_api_key', table_name='projects')
+    op.drop_index('ix_projects_api_key', table_name='projects')
+    op.drop_index('ix_projects_node_id', table_name='projects')
+    op.create_index('ix_projects_node_id', 'projects', ['node_id'], unique=False)
@@ -0,0 +1,27 @@
+"""Usage rollup bucket index
+
+Revision ID: d84b2e7c1f60
+Revises: 5e0f8c2a4b97
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+# revision identifiers, used by Alembic.
+revision = 'd84b2e7c1f60'
+down_revision = '5e0f8c2a4b97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves the daily rollup of all keys and the lookup of the first rolled up hour
+    op.create_index('ix_usagerollups_granularity_bucket_start', 'usagerollups', ['granularity', 'bucket_start'],
+                    unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_usagerollups_granularity_bucket_start', table_name='usagerollups')
@@ -0,0 +1,25 @@
+"""Project status changed on
+
+Revision ID: e2b5c8d41a97
+Revises: 7a3f91c2e6b4
+Create Date: 2026-10-18 13:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b5c8d41a97'
+down_revision = '7a3f91c2e6b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('projects', sa.Column('status_changed_on', sa.TIMESTAMP(), nullable=False,
+                                        server_default=sa.text('CURRENT_TIMESTAMP')))
+
+
+def downgrade():
+    op.drop_column('projects', 'status_changed_on')
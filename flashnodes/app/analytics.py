@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Literal, Optional, Sequence
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import crud, promql
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.prometheus import (
+    analytics_cache,
+    chunked,
+    get_analytics_total,
+    query_chunked,
+    query_range,
+    slice_resolution,
+    window_query,
+)
+from app.resampling import resample
+from app.utils import literal_to_seconds
+
+logger = logging.getLogger(__name__)
+
+HOUR = 3600
+DAY = 86400
+
+# Width of the rollup rows each chart is built from
+ROLLUP_RESOLUTION = {"1d": HOUR, "7d": HOUR, "30d": DAY}
+ROLLUPS_SINCE = "rollups_since"
+# Start of the rolled up hours, kept apart so its lookups do not count towards the analytics hit ratio
+coverage_cache = TTLCache(maxsize=1, ttl=settings.USAGE_ROLLUP_COVERAGE_TTL)
+
+
+async def read_rollups(db: AsyncSession, api_key_list: Sequence[str], timerange: Literal["1d", "7d", "30d"],
+                       start: int, end: int) -> List[List]:
+    """
+    Rolled up requests between `start` and `end`.
+
+    A 30d range reads daily rows for its whole days and hourly rows for the partial days at both ends.
+    """
+    spans = [("hour", start, end)]
+    if timerange == "30d":
+        first_day, last_day = -(-start // DAY) * DAY, end - end % DAY
+        spans = [("hour", start, first_day), ("day", first_day, last_day), ("hour", last_day, end)]
+    rows = []
+    for granularity, span_start, span_end in spans:
+        if span_start < span_end:
+            rows += await crud.usage.get_series_async(db, api_key_list, granularity,
+                                                      datetime.utcfromtimestamp(span_start),
+                                                      datetime.utcfromtimestamp(span_end))
+    return [[timestamp, requests] for timestamp, requests in rows]
+
+
+async def rollups_since(db: AsyncSession) -> Optional[float]:
+    """
+    Start of the oldest rolled up hour, None while the rollup table is empty.
+    """
+    since = coverage_cache.get(ROLLUPS_SINCE, default=False)
+    if since is False:
+        since = await crud.usage.get_first_hour_async(db)
+        coverage_cache.set(ROLLUPS_SINCE, since)
+    return since
+
+
+async def read_live(api_key_list: Sequence[str], now: int) -> Optional[List[List]]:
+    """
+    Requests of the previous and the current hour, which the rollup job may not have stored yet.
+    """
+    hour_start = now - now % HOUR
+
+    async def window(length: int, offset: int) -> float:
+        result = await query_chunked(
+            lambda chunk: window_query(promql.regex("api_key", chunk), length, offset), api_key_list
+        )
+        return sum(float(metric["value"][1]) for metric in result)
+
+    try:
+        previous, current = await asyncio.gather(
+            window(HOUR, now - hour_start), window(max(now - hour_start, 1), 0)
+        )
+    except httpx.HTTPError:
+        # Serve the rolled up part of the chart while Prometheus is unavailable
+        logger.warning("Live usage for the current hour is unavailable", exc_info=True)
+        return None
+    return [[hour_start - HOUR, previous], [hour_start, current]]
+
+
+async def get_rollup_analytics(db: AsyncSession, api_key_list: List[str], timerange: Literal["1d", "7d", "30d"],
+                               steps: int) -> List:
+    """
+    Chart built from the usage rollup table, only the last two hours are asked from Prometheus.
+
+    Buckets are at least as wide as the rows they are built from. Until the rollups reach back to the
+    start of the range, e.g. right after deploying without a backfill, the chart comes from Prometheus.
+    """
+    now = int(time.time())
+    seconds = literal_to_seconds(timerange)
+    since = await rollups_since(db)
+    if since is None or since > now - seconds:
+        return await get_analytics_total(api_key_list, timerange, steps)
+    cache_key = ("rollup", tuple(sorted(api_key_list)), timerange, steps)
+    cached = analytics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    rolled_until = now - now % HOUR - HOUR
+    rollups = await read_rollups(db, api_key_list, timerange, now - seconds, rolled_until)
+    live = await read_live(api_key_list, now)
+    analytics = resample([rollups, live or []], seconds, steps, now=now, resolution=ROLLUP_RESOLUTION[timerange])
+    if live is not None:
+        analytics_cache.set(cache_key, analytics, ttl=slice_resolution(timerange))
+    return analytics
+
+
+async def export_usage(api_key_list: Sequence[str], start: int, end: int, step: int) -> AsyncIterator[Dict]:
+    """
+    Per api key requests of every `step` seconds between `start` and `end`.
+
+    The range is fetched in pages of PROMETHEUS_EXPORT_PAGE_POINTS points and one key chunk at a time,
+    so only a single page is held in memory.
+    """
+    page_span = step * (settings.PROMETHEUS_EXPORT_PAGE_POINTS - 1)
+    page_start = start
+    while page_start <= end:
+        page_end = min(page_start + page_span, end)
+        for chunk in chunked(api_key_list, settings.PROMETHEUS_KEY_CHUNK_SIZE):
+            result = await query_range(
+                window_query(promql.regex("api_key", chunk), step, by=["api_key"]), page_start, page_end, step
+            )
+            for metric in result:
+                for timestamp, value in metric["values"]:
+                    yield {
+                        "api_key": metric["metric"]["api_key"],
+                        "timestamp": int(timestamp),
+                        "requests": max(round(float(value)), 0)
+                    }
+        page_start = page_end + step
@@ -1,14 +1,24 @@
 import random
 import string
 from datetime import datetime
-from typing import Literal, Optional
+from typing import Any, Literal, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app import crud, models, schemas
 from app.api import deps
+from app.api.responses import ORJSONResponse
+from app.api.serializers import serialize_project
+from app.core import metrics
+from app.core.celery_app import send_deployment
+from app.core.config import settings
+from app.prometheus import get_top_api_keys
 from app.schemas import Cryptocurrency, ProjectResponse, Project, ProjectDB
+from app.schemas.project import paid_until_in_future
+from app.utils import decode_cursor, encode_cursor, is_uuid
 
 router = APIRouter()
 
@@ -19,7 +29,7 @@ def create_cryptocurrency(
         body: schemas.Cryptocurrency,
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_active_superuser)
-):
+) -> Any:
     if crud.crypto.exists(db, symbol=body.symbol):
         raise HTTPException(
             status_code=422,
@@ -32,7 +42,7 @@ def create_cryptocurrency(
 @router.get("/cryptocurrencies", status_code=200)
 def get_cryptocurrencies(
         db: Session = Depends(deps.get_db),
-        current_user: models.User = Depends(deps.get_current_active_superuser)):
+        current_user: models.User = Depends(deps.get_current_active_superuser)) -> Any:
     return {
         "results": crud.crypto.get_all(db)
     }
@@ -43,7 +53,7 @@ def get_cryptocurrency(
         cryptocurrency_id: int,
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_active_superuser)
-):
+) -> Any:
     cryptocurrency = crud.crypto.get_by_id(db, cryptocurrency_id)
     if not cryptocurrency:
         raise HTTPException(
@@ -61,7 +71,7 @@ def update_cryptocurrency(
         cryptocurrency_id: int,
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_active_superuser)
-):
+) -> Any:
     old_cryptocurrency = crud.crypto.get_by_id(db, cryptocurrency_id)
     if not old_cryptocurrency:
         raise HTTPException(
@@ -79,7 +89,7 @@ def delete_cryptocurrency(
         cryptocurrency_id: int,
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_active_superuser)
-):
+) -> None:
     if not crud.crypto.get_by_id(db, cryptocurrency_id):
         raise HTTPException(
             status_code=404,
@@ -89,15 +99,43 @@ def delete_cryptocurrency(
 
 
 # Projects CRUD
+@router.post("/projects/manage", status_code=200, response_model=schemas.ProjectsManageResponse)
+def manage_projects(
+        body: schemas.ProjectsManage,
+        db: Session = Depends(deps.get_db),
+        current_user: models.User = Depends(deps.get_current_active_superuser)
+) -> Any:
+    """
+    Apply the same status and payment changes to up to 1000 projects at once.
+
+    paid_until: ISO 8601
+    """
+    values = body.dict(include={"status", "is_paid", "paid_until"}, exclude_none=True)
+    if not values:
+        raise HTTPException(
+            status_code=422,
+            detail="No changes specified"
+        )
+    node_ids = list(dict.fromkeys(body.node_ids))
+    updated = {row.node_id: row for row in crud.projects.manage_many_internal(db, node_ids, values)}
+    return {
+        "results": [
+            {"node_id": node_id, "result": "updated", **updated[node_id]._asdict()} if node_id in updated
+            else {"node_id": node_id, "result": "not_found"}
+            for node_id in node_ids
+        ]
+    }
+
+
 @router.post("/projects/manage/{node_id}", status_code=200)
 def manage_project(
         node_id: str,
         reserve_until: Optional[str] = None,
         is_paid: Optional[bool] = None,
-        set_status: Optional[Literal["pending", "deploying", "active", "expired"]] = None,
+        set_status: Optional[Literal["pending", "deploying", "active", "failed", "expired"]] = None,
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_active_superuser)
-):
+) -> Any:
     """
     Endpoint for managing the project status.
 
@@ -115,65 +153,77 @@ def manage_project(
             status_code=422,
             detail="No changes specified"
         )
+    paid_until = None
     if reserve_until:
         try:
-            reserve_until = datetime.fromisoformat(reserve_until)
+            paid_until = datetime.fromisoformat(reserve_until)
         except ValueError:
             raise HTTPException(
                 status_code=422,
                 detail="Incorrect date format"
             )
-    project = crud.projects.manage_by_node_id_internal(db, project, reserve_until, is_paid, set_status)
+        try:
+            paid_until = paid_until_in_future(paid_until)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=422,
+                detail=str(e)
+            )
+    project = crud.projects.manage_by_node_id_internal(db, project, paid_until, is_paid, set_status)
     return {
-        "result": ProjectResponse(
-            node_id=project.node_id,
-            cryptocurrency_symbol=project.cryptocurrency_symbol,
-            cryptocurrency_full_name=crud.crypto.get_by_symbol(db, project.cryptocurrency_symbol).full_name,
-            mode=project.mode.value,
-            network=project.network.value,
-            is_paid=project.is_paid,
-            paid_until=str(project.paid_until),
-            created_on=str(project.created_on),
-            api_key=project.api_key,
-            status=project.status,
-            public_address=public_address,
-            prefix=project.prefix
+        "result": serialize_project(
+            project, crud.crypto.get_by_symbol(db, project.cryptocurrency_symbol).full_name, public_address
         )
     }
 
 
 @router.get("/projects", status_code=200)
 def list_projects(
-        offset: int = None,
-        limit: int = None,
+        cursor: Optional[str] = None,
+        offset: Optional[int] = Query(None, deprecated=True),
+        limit: int = settings.PROJECTS_PAGE_SIZE,
+        total: Literal["estimate", "exact"] = "exact",
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_active_superuser)
-):
-    if offset and offset < 0 or limit and limit < 0:
+) -> Any:
+    """
+    Newest projects first, one page at a time.
+
+    cursor: `next_cursor` of the previous page, omitted for the first page
+    offset: deprecated, skips that many projects and slows down with every page, use `cursor` instead
+    total: "estimate" reads the planner statistics, "exact" is a count cached for a minute
+    """
+    if not 0 < limit <= settings.PROJECTS_MAX_PAGE_SIZE:
         raise HTTPException(
             status_code=422,
-            detail="Incorrect offset or limit format"
+            detail=f"Limit should be between 1 and {settings.PROJECTS_MAX_PAGE_SIZE}"
         )
-    return {
-        "results": [
-            ProjectResponse(
-                node_id=project.node_id,
-                cryptocurrency_symbol=project.cryptocurrency_symbol,
-                cryptocurrency_full_name=cryptocurrency_full_name,
-                mode=project.mode.value,
-                network=project.network.value,
-                is_paid=project.is_paid,
-                paid_until=str(project.paid_until),
-                created_on=str(project.created_on),
-                api_key=project.api_key,
-                status=project.status,
-                public_address=public_address,
-                prefix=project.prefix
-            ) for project, cryptocurrency_full_name, public_address in crud.projects.get_all_internal(db, limit=limit,
-                                                                                                      offset=offset)
-        ],
-        "total": crud.projects.get_total_amount(db)
-    }
+    if offset is not None and (offset < 0 or cursor is not None):
+        raise HTTPException(
+            status_code=422,
+            detail="Offset can't be negative or combined with a cursor"
+        )
+    before_id = None
+    if cursor is not None:
+        before_id = decode_cursor(cursor)
+        if before_id is None:
+            raise HTTPException(
+                status_code=422,
+                detail="Incorrect cursor"
+            )
+    # One extra row tells whether another page follows
+    rows = crud.projects.get_all_internal(db, limit=limit + 1, before_id=before_id, offset=offset)
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].id) if len(rows) > limit else None
+    if total == "estimate":
+        total_count = crud.projects.get_total_estimate(db)
+    else:
+        total_count = crud.projects.get_total_cached(db)
+    return ORJSONResponse({
+        "results": [serialize_project(project) for project in page],
+        "next_cursor": next_cursor,
+        "total": total_count
+    })
 
 
 @router.get("/projects/{public_address}", status_code=200)
@@ -181,26 +231,24 @@ def list_projects_for_address(
         public_address: str,
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_active_superuser)
-):
-    return {
+) -> Any:
+    """
+    Projects of one or more owners.
+
+    public_address: a single address or a comma separated list of up to 100 addresses
+    """
+    public_addresses = list({address.strip().lower() for address in public_address.split(",") if address.strip()})
+    if not 0 < len(public_addresses) <= 100:
+        raise HTTPException(
+            status_code=422,
+            detail="Specify between 1 and 100 public addresses"
+        )
+    return ORJSONResponse({
         "results": [
-            ProjectResponse(
-                node_id=project.node_id,
-                cryptocurrency_symbol=project.cryptocurrency_symbol,
-                cryptocurrency_full_name=cryptocurrency_full_name,
-                mode=project.mode.value,
-                network=project.network.value,
-                is_paid=project.is_paid,
-                paid_until=str(project.paid_until),
-                created_on=str(project.created_on),
-                api_key=project.api_key,
-                status=project.status,
-                public_address=public_address,
-                prefix=project.prefix
-            ) for project, cryptocurrency_full_name, public_address in
-            crud.projects.list_projects_by_public_address(db, public_address.lower())
+            serialize_project(project)
+            for project in crud.projects.list_projects_by_public_addresses(db, public_addresses)
         ]
-    }
+    })
 
 
 @router.delete("/projects/{node_id}", status_code=204)
@@ -208,7 +256,7 @@ def delete_project(
         node_id: str,
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_active_superuser)
-):
+) -> None:
     project = crud.projects.get_by_node_id_internal(db, node_id)
     if not project:
         raise HTTPException(
@@ -219,11 +267,64 @@ def delete_project(
     crud.projects.delete_by_node_id_internal(db, node_id)
 
 
+# Monitoring
+@router.get("/metrics", status_code=200)
+def get_metrics(current_user: models.User = Depends(deps.get_current_active_superuser)) -> Any:
+    """
+    Live counters and gauges of this worker process.
+    """
+    return metrics.snapshot()
+
+
+# Analytics
+@router.get("/analytics/top", status_code=200)
+async def get_top_projects(
+        timerange: Literal["1h", "1d", "7d", "30d"],
+        limit: int = 10,
+        db: Session = Depends(deps.get_db),
+        current_user: models.User = Depends(deps.get_current_active_superuser)
+) -> Any:
+    """
+    Busiest nodes of the fleet by request volume over the timerange.
+    """
+    if not 0 < limit <= 100:
+        raise HTTPException(
+            status_code=422,
+            detail="Limit should be between 1 and 100"
+        )
+    try:
+        top = await get_top_api_keys(timerange, limit)
+    except httpx.HTTPError:
+        raise HTTPException(
+            status_code=503,
+            detail="Analytics are temporarily unavailable"
+        )
+    api_keys = [item["api_key"] for item in top if is_uuid(item["api_key"])]
+    owners = {
+        str(api_key): (node_id, cryptocurrency_symbol, public_address)
+        for api_key, node_id, cryptocurrency_symbol, public_address in
+        (await run_in_threadpool(crud.projects.get_owners_by_api_keys, db, api_keys) if api_keys else [])
+    }
+    results = []
+    for item in top:
+        node_id, cryptocurrency_symbol, public_address = owners.get(item["api_key"], (None, None, None))
+        results.append({
+            "api_key": item["api_key"],
+            "node_id": node_id,
+            "cryptocurrency_symbol": cryptocurrency_symbol,
+            "public_address": public_address,
+            "requests": item["requests"]
+        })
+    return {
+        "results": results
+    }
+
+
 # Superadmin CRUD
 @router.post("/superuser/{public_address}", status_code=204)
 def add_superuser_rights(public_address: str,
                          db: Session = Depends(deps.get_db),
-                         current_user: models.User = Depends(deps.get_current_active_superuser)):
+                         current_user: models.User = Depends(deps.get_current_active_superuser)) -> None:
     user: models.User = crud.user.get_user_by_address(db, public_address.lower())
     if not user:
         raise HTTPException(
@@ -243,7 +344,7 @@ def add_superuser_rights(public_address: str,
 @router.get("/superuser", status_code=200)
 def list_superusers(
         db: Session = Depends(deps.get_db),
-        current_user: models.User = Depends(deps.get_current_active_superuser)):
+        current_user: models.User = Depends(deps.get_current_active_superuser)) -> Any:
 
     return {
         "results": crud.user.get_superusers(db)
@@ -253,7 +354,7 @@ def list_superusers(
 @router.delete("/superuser/{public_address}", status_code=204)
 def remove_superuser_rights(public_address: str,
                             db: Session = Depends(deps.get_db),
-                            current_user: models.User = Depends(deps.get_current_active_superuser)):
+                            current_user: models.User = Depends(deps.get_current_active_superuser)) -> None:
     user: models.User = crud.user.get_user_by_address(db, public_address.lower())
     if not user:
         raise HTTPException(
@@ -281,7 +382,7 @@ def create_project(
         body: Project,
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_active_superuser),
-):
+) -> Any:
     user = crud.user.get_user_by_address(db, public_address.lower())
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -300,19 +401,6 @@ def create_project(
         prefix=''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
     )
     project = crud.projects.create(db, new_project)
+    send_deployment(str(project.node_id))
 
-    # Data encapsulation
-    return ProjectResponse(
-        node_id=project.node_id,
-        cryptocurrency_symbol=project.cryptocurrency_symbol,
-        cryptocurrency_full_name=crypto.full_name,
-        mode=project.mode.value,
-        network=project.network.value,
-        is_paid=project.is_paid,
-        paid_until=str(project.paid_until) if project.paid_until else None,
-        created_on=str(project.created_on),
-        api_key=project.api_key,
-        status=project.status,
-        public_address=public_address.lower(),
-        prefix=project.prefix
-    )
+    return serialize_project(project, crypto.full_name, public_address.lower())
@@ -1,105 +1,196 @@
-from typing import Literal
+import csv
+import io
+import json
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Dict, List, Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic.types import UUID
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, models
+from app.analytics import export_usage, get_rollup_analytics
 from app.api import deps
-from app.prometheus import get_analytics, get_analytics_total
-from app.utils import generate_timestamp_list, collapse_prometheus_response, literal_to_seconds
+from app.core.config import settings
+from app.prometheus import get_analytics, get_analytics_breakdown, get_analytics_total
+from app.utils import literal_to_seconds
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+EXPORT_FIELDS = ("node_id", "api_key", "timestamp", "requests")
+
+
+def chart_response(analytics: List[Dict], timerange: Literal["1h", "1d", "7d", "30d"]) -> Dict[str, Any]:
+    total = sum(step["value"] for step in analytics)
+    return {
+        "chart": analytics,
+        "total": total,
+        "average": round(total/literal_to_seconds(timerange), 2)
+    }
+
+
+def as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
 
 @router.get("/total", status_code=200)
-def get_project_analytics_total(
+async def get_project_analytics_total(
         timerange: Literal["1h", "1d", "7d", "30d"],
-        db: Session = Depends(deps.get_db),
+        db: AsyncSession = Depends(deps.get_async_db),
         steps: int = 6,
-        current_user: models.User = Depends(deps.get_current_user)
-):
+        current_user: models.User = Depends(deps.get_current_user_async)
+) -> Any:
     if not 1 < steps < 100:
         raise HTTPException(
             status_code=422,
             detail="Step should be bigger than 1 and smaller than 100"
         )
-    api_key_projects = [str(project.api_key) for project in crud.projects.get_all_api_keys(db, current_user.id)]
+    api_key_projects = await crud.projects.get_all_api_keys_async(db, current_user.id)
     if not api_key_projects:
         raise HTTPException(
             status_code=404,
             detail="No projects found"
         )
 
-    analytics = get_analytics_total(api_key_projects, timerange)
-    if analytics:
-        values = [step["value"] for step in analytics]
-        total = sum(values)
-        return {
-            "chart": analytics,
-            "total": total,
-            "average": round(total/literal_to_seconds(timerange), 2)
-        }
-    hours = 0
-    if timerange == "1h":
-        hours += 1
-    else:
-        hours += int(timerange[:-1])*24
-    timestamp_list = [{
-            "timestamp": timestamp,
-            "value": 0
-        } for timestamp in generate_timestamp_list(hours=hours)]  # replace method later
+    try:
+        if timerange == "1h":
+            analytics = await get_analytics_total(api_key_projects, timerange, steps)
+        else:
+            analytics = await get_rollup_analytics(db, api_key_projects, timerange, steps)
+    except httpx.HTTPError:
+        raise HTTPException(
+            status_code=503,
+            detail="Analytics are temporarily unavailable"
+        )
+    return chart_response(analytics, timerange)
+
+
+@router.get("/breakdown", status_code=200)
+async def get_project_analytics_breakdown(
+        timerange: Literal["1h", "1d", "7d", "30d"],
+        db: AsyncSession = Depends(deps.get_async_db),
+        steps: int = 6,
+        current_user: models.User = Depends(deps.get_current_user_async)
+) -> Any:
+    """
+    Charts of every project of the user, keyed by node id.
+    """
+    if not 1 < steps < 100:
+        raise HTTPException(
+            status_code=422,
+            detail="Step should be bigger than 1 and smaller than 100"
+        )
+    projects = await crud.projects.get_node_ids_by_api_key_async(db, current_user.id)
+    if not projects:
+        raise HTTPException(
+            status_code=404,
+            detail="No projects found"
+        )
+    node_ids = {str(api_key): str(node_id) for api_key, node_id in projects.items()}
+    try:
+        analytics = await get_analytics_breakdown(list(node_ids), timerange, steps)
+    except httpx.HTTPError:
+        raise HTTPException(
+            status_code=503,
+            detail="Analytics are temporarily unavailable"
+        )
     return {
-        "chart": collapse_prometheus_response(timestamp_list, steps),
-        "total": 0,
-        "average": 0
+        node_id: chart_response(analytics.get(api_key, []), timerange) for api_key, node_id in node_ids.items()
     }
 
 
+@router.get("/export", status_code=200)
+async def export_project_usage(
+        start: datetime,
+        end: datetime,
+        step: int = 3600,
+        export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+        db: AsyncSession = Depends(deps.get_async_db),
+        current_user: models.User = Depends(deps.get_current_user_async)
+) -> Any:
+    """
+    Stream per node requests of every `step` seconds between `start` and `end` (ISO 8601, UTC unless
+    an offset is given).
+    """
+    start, end = as_utc(start), as_utc(end)
+    if step < 60:
+        raise HTTPException(
+            status_code=422,
+            detail="Step should be at least 60 seconds"
+        )
+    if end <= start:
+        raise HTTPException(
+            status_code=422,
+            detail="End should be after start"
+        )
+    if end - start > timedelta(days=settings.USAGE_EXPORT_MAX_DAYS):
+        raise HTTPException(
+            status_code=422,
+            detail=f"Range should not exceed {settings.USAGE_EXPORT_MAX_DAYS} days"
+        )
+    projects = await crud.projects.get_node_ids_by_api_key_async(db, current_user.id)
+    if not projects:
+        raise HTTPException(
+            status_code=404,
+            detail="No projects found"
+        )
+    node_ids = {str(api_key): str(node_id) for api_key, node_id in projects.items()}
+
+    async def rows() -> AsyncIterator[str]:
+        if export_format == "csv":
+            yield ",".join(EXPORT_FIELDS) + "\r\n"
+        try:
+            async for row in export_usage(list(node_ids), int(start.timestamp()), int(end.timestamp()), step):
+                row["node_id"] = node_ids.get(row["api_key"])
+                if export_format == "csv":
+                    line = io.StringIO()
+                    csv.DictWriter(line, EXPORT_FIELDS).writerow(row)
+                    yield line.getvalue()
+                else:
+                    yield json.dumps(row) + "\n"
+        except httpx.HTTPError:
+            # Headers are already sent, the truncated body is all the client can get
+            logger.exception("Usage export interrupted")
+
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv" if export_format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename=usage.{export_format}"}
+    )
+
+
 @router.get("/{node_id}", status_code=200)
-def get_project_analytics(
+async def get_project_analytics(
         node_id: UUID,
         timerange: Literal["1h", "1d", "7d", "30d"],
         steps: int = 6,
-        db: Session = Depends(deps.get_db),
-        current_user: models.User = Depends(deps.get_current_user)
-):
+        db: AsyncSession = Depends(deps.get_async_db),
+        current_user: models.User = Depends(deps.get_current_user_async)
+) -> Any:
     if not 1 < steps < 100:
         raise HTTPException(
             status_code=422,
             detail="Step should be bigger than 1 and smaller than 100"
         )
-    api_key_project = crud.projects.get_api_key_by_node_id(db, current_user.id, node_id)
+    api_key_project = await crud.projects.get_api_key_by_node_id_async(db, current_user.id, node_id)
     if not api_key_project:
         raise HTTPException(
             status_code=404,
             detail="Project not found"
         )
-    analytics = get_analytics(api_key_project.api_key, timerange)
-    if analytics:
-        values = [step["value"] for step in analytics]
-        total = sum(values)
-        return {
-            "chart": analytics,
-            "total": total,
-            "average": round(total/literal_to_seconds(timerange), 2)
-        }
-    hours = 0
-    if timerange == "1h":
-        hours += 1
-    else:
-        hours += int(timerange[0]) * 24
-    hours = 0
-    if timerange == "1h":
-        hours += 1
-    else:
-        hours += int(timerange[:-1]) * 24
-    timestamp_list = [{
-        "timestamp": timestamp,
-        "value": 0
-    } for timestamp in generate_timestamp_list(hours=hours)]  # replace method later
-    return {
-        "chart": collapse_prometheus_response(timestamp_list, steps),
-        "total": 0,
-        "average": 0
-    }
+    try:
+        if timerange == "1h":
+            analytics = await get_analytics(api_key_project.api_key, timerange, steps)
+        else:
+            analytics = await get_rollup_analytics(db, [str(api_key_project.api_key)], timerange, steps)
+    except httpx.HTTPError:
+        raise HTTPException(
+            status_code=503,
+            detail="Analytics are temporarily unavailable"
+        )
+    return chart_response(analytics, timerange)
@@ -1,18 +1,17 @@
-from datetime import timedelta
+from datetime import datetime, timedelta
 from typing import Any
 
-from eth_account import Account, messages
 from eth_utils import is_address
 from fastapi import APIRouter, Body, Depends, HTTPException
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from app import crud, models, schemas
 from app.api import deps
 from app.core import security
 from app.core.config import settings
-from app.core.security import get_password_hash
+from app.core.signatures import VerificationOverloaded, VerificationUnavailable, recover_address
 from app.utils import (
-    generate_nonce_url_safe,
     generate_password_reset_token,
     send_reset_password_email,
     verify_password_reset_token,
@@ -22,44 +21,50 @@ router = APIRouter()
 
 
 @router.get("/metamask/nonce/{public_address}", response_model=schemas.UserMetamaskNonceResponse)
-def get_associated_nonce(
-    public_address: str,
-    db: Session = Depends(deps.get_db)
-):
+def get_associated_nonce(public_address: str) -> Any:
+    """
+    Signed, expiring nonce for the address, nothing is stored until the login succeeds.
+    """
     public_address = public_address.lower()
     if not is_address(public_address):
         raise HTTPException(status_code=422, detail="Incorrect address")
 
-    nonce = generate_nonce_url_safe()
-    nonce_result = schemas.UserMetamaskCreateDB(public_address=public_address,
-                                                nonce=nonce)
-    user = crud.user.get_user_by_address(db, public_address)
-    if not user:
-        crud.user.create_metamask(db, nonce_result)
-    else:
-        crud.user.update_nonce(db, user, nonce)
-    return nonce_result
+    return schemas.UserMetamaskNonceResponse(public_address=public_address,
+                                             nonce=security.generate_login_nonce(public_address))
 
 
 @router.post("/auth", response_model=schemas.Token)
-def login_via_metamask(
+async def login_via_metamask(
     body: schemas.UserMetamaskVerify,
     db: Session = Depends(deps.get_db)
-):
+) -> Any:
     public_address = body.public_address.lower()
     if not is_address(public_address):
         raise HTTPException(status_code=422, detail="Incorrect address")
 
-    user = crud.user.get_user_by_address(db, public_address)
-    if not user:
-        raise HTTPException(status_code=403, detail="Associated nonce does not exist")
-    nonce = messages.encode_defunct(text=user.nonce)
-
-    if not Account.recover_message(nonce, signature=body.signed_nonce).lower() == public_address:
+    token = security.login_nonce_token(public_address, body.nonce)
+    if token is None or await run_in_threadpool(crud.nonces.is_used, db, token):
+        raise HTTPException(status_code=403, detail="Nonce is invalid, expired or already used")
+
+    # The nonce is only used up once the signature is verified, a login turned away with 503 can be retried
+    try:
+        signer = await recover_address(body.nonce, body.signed_nonce)
+    except VerificationOverloaded:
+        raise HTTPException(status_code=503, detail="Too many logins in progress, try again later")
+    except VerificationUnavailable:
+        raise HTTPException(status_code=503, detail="Signature verification is unavailable, try again later")
+    if not signer or signer.lower() != public_address:
         raise HTTPException(status_code=403, detail="Nonce signature couldn't been verified")
+    # Kept at least until the nonce expires, a replay to any worker is turned away until then
+    expires_at = datetime.utcnow() + timedelta(seconds=settings.NONCE_EXPIRE_SECONDS)
+    if not await run_in_threadpool(crud.nonces.consume, db, token, expires_at):
+        # Another request presented the same nonce while this one was verified
+        raise HTTPException(status_code=403, detail="Nonce is invalid, expired or already used")
 
-    new_nonce = generate_nonce_url_safe()
-    crud.user.update_nonce(db, user, new_nonce)
+    user = await run_in_threadpool(crud.user.get_user_by_address, db, public_address)
+    if not user:
+        user = await run_in_threadpool(crud.user.create_metamask, db,
+                                       schemas.UserMetamaskCreate(public_address=public_address))
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
@@ -67,7 +72,7 @@ def login_via_metamask(
             user.id, expires_delta=access_token_expires
         ),
         "token_type": "bearer",
-        "nonce": new_nonce
+        "nonce": security.generate_login_nonce(public_address)
     }
 
 
@@ -118,8 +123,5 @@ def reset_password(
         )
     elif not crud.user.is_active(user):
         raise HTTPException(status_code=400, detail="Inactive user")
-    hashed_password = get_password_hash(new_password)
-    user.hashed_password = hashed_password
-    db.add(user)
-    db.commit()
+    crud.user.update(db, db_obj=user, obj_in={"password": new_password})
     return {"msg": "Password updated successfully"}
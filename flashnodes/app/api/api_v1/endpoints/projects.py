@@ -1,12 +1,17 @@
 import random
 import string
+from typing import Any
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app import crud, models
 from app.api import deps
+from app.api.responses import ORJSONResponse
+from app.api.serializers import serialize_project
+from app.core.celery_app import send_deployment
 from app.schemas import Project, ProjectDB, ProjectResponse
 
 router = APIRouter()
@@ -17,7 +22,7 @@ def create_project(
         body: Project,
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_user),
-):
+) -> Any:
     crypto = crud.crypto.get_by_symbol(db, body.cryptocurrency_symbol)
     if not crypto:
         raise HTTPException(
@@ -33,45 +38,20 @@ def create_project(
         prefix=''.join(random.choices(string.ascii_lowercase + string.digits, k=8))
     )
     project = crud.projects.create(db, new_project)
-    # Data encapsulation
-    return ProjectResponse(
-        node_id=project.node_id,
-        cryptocurrency_symbol=project.cryptocurrency_symbol,
-        cryptocurrency_full_name=crypto.full_name,
-        mode=project.mode.value,
-        network=project.network.value,
-        is_paid=project.is_paid,
-        paid_until=str(project.paid_until) if project.paid_until else None,
-        created_on=str(project.created_on),
-        api_key=project.api_key,
-        status=project.status,
-        public_address=current_user.public_address,
-        prefix=project.prefix
-    )
+    send_deployment(str(project.node_id))
+    return serialize_project(project, crypto.full_name, current_user.public_address)
 
 
 @router.get("", status_code=200)
-def get_projects(
-        db: Session = Depends(deps.get_db),
-        current_user: models.User = Depends(deps.get_current_user)):
-    return {
+async def get_projects(
+        db: AsyncSession = Depends(deps.get_async_db),
+        current_user: models.User = Depends(deps.get_current_user_async)) -> Any:
+    return ORJSONResponse({
         "results": [
-            ProjectResponse(
-                node_id=project.node_id,
-                cryptocurrency_symbol=project.cryptocurrency_symbol,
-                cryptocurrency_full_name=cryptocurrency_full_name,
-                mode=project.mode.value,
-                network=project.network.value,
-                is_paid=project.is_paid,
-                paid_until=str(project.paid_until),
-                created_on=str(project.created_on),
-                api_key=project.api_key,
-                status=project.status,
-                public_address=current_user.public_address,
-                prefix=project.prefix
-            ) for project, cryptocurrency_full_name in crud.projects.get_all(db, current_user.id)
+            serialize_project(project, public_address=current_user.public_address)
+            for project in await crud.projects.get_all_async(db, current_user.id)
         ]
-    }
+    })
 
 
 @router.get("/{node_id}", status_code=200)
@@ -79,7 +59,7 @@ def get_project(
         node_id: UUID,
         db: Session = Depends(deps.get_db),
         current_user: models.User = Depends(deps.get_current_user)
-):
+) -> Any:
     project = crud.projects.get_by_node_id(db, node_id, current_user.id)
     if not project:
         raise HTTPException(
@@ -87,30 +67,18 @@ def get_project(
             detail="Project does not exist"
         )
     project, cryptocurrency_full_name = project
-    result = ProjectResponse(
-        node_id=project.node_id,
-        cryptocurrency_symbol=project.cryptocurrency_symbol,
-        cryptocurrency_full_name=cryptocurrency_full_name,
-        mode=project.mode.value,
-        network=project.network.value,
-        is_paid=project.is_paid,
-        paid_until=str(project.paid_until),
-        created_on=str(project.created_on),
-        api_key=project.api_key,
-        status=project.status,
-        public_address=current_user.public_address,
-        prefix=project.prefix
-    )
     return {
-        "result": result
+        "result": serialize_project(project, cryptocurrency_full_name, current_user.public_address)
     }
 
 
 @router.get("/cryptocurrencies", status_code=200)
 def get_cryptocurrencies(
-        db: Session = Depends(deps.get_db),
         # current_user: models.User = Depends(deps.get_current_user)
-):
+) -> Any:
+    """
+    Served from the in-memory catalog, a stale one is reloaded with a session of its own.
+    """
     return {
-        "results": crud.crypto.get_all(db)
+        "results": crud.crypto.get_all()
     }
@@ -38,7 +38,7 @@ def test_email(
 
 @router.post("/test-datetime/{datetime_iso}", status_code=200)
 def test_datetime_format(datetime_iso: str,
-                         current_user: models.User = Depends(deps.get_current_active_superuser)):
+                         current_user: models.User = Depends(deps.get_current_active_superuser)) -> Any:
     """
     Test datetime format for project request approval (ISO 8601)
     """
@@ -1,15 +1,17 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from app import crud, models, schemas
 from app.core import security
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.crud.crud_user import user_cache
+from app.db.session import AsyncSessionLocal, SessionLocal
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
@@ -24,20 +26,76 @@ def get_db() -> Generator:
         db.close()
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> models.User:
+async def get_async_db() -> AsyncGenerator:
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_user_cached(db: Session, user_id: int) -> Optional[models.User]:
+    """
+    Look the user up in the identity cache first, a hit costs no database round trip.
+
+    Every call gets its own instance attached to `db`, so it can be updated like a loaded one.
+    """
+    values = user_cache.get(user_id)
+    if values is None:
+        user = crud.user.get(db, id=user_id)
+        if user:
+            user_cache.set(user_id, {
+                column.key: getattr(user, column.key) for column in models.User.__table__.columns
+            })
+        return user
+    user = models.User(**values)
+    make_transient_to_detached(user)
+    db.add(user)
+    return user
+
+
+async def get_user_cached_async(db: AsyncSession, user_id: int) -> Optional[models.User]:
+    """
+    Identity cache lookup for async endpoints, a hit is returned detached since they never write through it.
+    """
+    values = user_cache.get(user_id)
+    if values is None:
+        user = await crud.user.get_async(db, id=user_id)
+        if user:
+            user_cache.set(user_id, {
+                column.key: getattr(user, column.key) for column in models.User.__table__.columns
+            })
+        return user
+    user = models.User(**values)
+    make_transient_to_detached(user)
+    return user
+
+
+def decode_token(token: str) -> schemas.TokenPayload:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[security.ALGORITHM]
         )
-        token_data = schemas.TokenPayload(**payload)
+        return schemas.TokenPayload(**payload)
     except (jwt.JWTError, ValidationError):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = crud.user.get(db, id=token_data.sub)
+
+
+def get_current_user(
+    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> models.User:
+    token_data = decode_token(token)
+    user = get_user_cached(db, token_data.sub)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(reusable_oauth2)
+) -> models.User:
+    token_data = decode_token(token)
+    user = await get_user_cached_async(db, token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
@@ -52,8 +110,15 @@ def get_current_active_user(
 
 
 def get_current_active_superuser(
-    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
 ) -> models.User:
+    """
+    Reads the user past the identity cache, a demoted superuser loses access on every worker at once.
+    """
+    token_data = decode_token(token)
+    current_user = crud.user.get(db, id=token_data.sub)
+    if not current_user:
+        raise HTTPException(status_code=404, detail="User not found")
     if not crud.user.is_superuser(current_user):
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
@@ -0,0 +1,24 @@
+from typing import Any, Dict, Optional
+
+
+def serialize_project(project: Any, cryptocurrency_full_name: Optional[str] = None,
+                      public_address: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Response body of a project, from a `PROJECT_COLUMNS` row or a `Projects` entity.
+
+    Rows carry the cryptocurrency name and possibly the owner address, entities need them passed in.
+    """
+    return {
+        "node_id": project.node_id,
+        "cryptocurrency_symbol": project.cryptocurrency_symbol,
+        "cryptocurrency_full_name": cryptocurrency_full_name or project.cryptocurrency_full_name,
+        "mode": project.mode.value,
+        "network": project.network.value,
+        "is_paid": project.is_paid,
+        "paid_until": str(project.paid_until) if project.paid_until else None,
+        "created_on": str(project.created_on),
+        "api_key": project.api_key,
+        "status": project.status,
+        "public_address": public_address or getattr(project, "public_address", None),
+        "prefix": project.prefix
+    }
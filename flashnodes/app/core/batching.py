@@ -0,0 +1,37 @@
+from typing import Any, Callable, Iterable, List, Sequence
+
+from celery import Celery
+from celery.app.task import Task
+
+
+def batched_task(app: Celery, batch_size: int, **options: Any) -> Callable[[Callable], Task]:
+    """
+    Register `fn(*args)` as a task that runs a whole batch of argument tuples in one execution.
+
+    `task.delay_many(items)` sends `batch_size` items per message, so the broker round trip, the
+    prefetch slot and the worker dispatch are paid once per batch instead of once per item.
+    A failing item fails and retries its whole batch, `fn` has to be idempotent.
+    """
+    def decorator(fn: Callable) -> Task:
+        # Left as they are, the options are shared by every function decorated through this call
+        name = options.get("name", f"{fn.__module__}.{fn.__name__}")
+
+        @app.task(**{**options, "name": name})
+        def run(batch: List[Sequence]) -> int:
+            for args in batch:
+                fn(*args)
+            return len(batch)
+
+        def delay_many(items: Iterable[Sequence]) -> int:
+            """
+            Send the items in batches, returns the number of messages sent.
+            """
+            items = [list(args) for args in items]
+            for start in range(0, len(items), batch_size):
+                run.apply_async(args=[items[start:start + batch_size]])
+            return -(-len(items) // batch_size)
+
+        run.delay_many = delay_many
+        return run
+
+    return decorator
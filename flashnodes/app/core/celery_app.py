@@ -1,5 +1,89 @@
+import logging
+import sys
+from typing import Any, Dict
+
 from celery import Celery
+from celery.schedules import crontab
+from kombu.exceptions import OperationalError
+
+from app.core.config import settings
+
+celery_app = Celery("worker", broker=settings.CELERY_BROKER_URL, backend=settings.CELERY_RESULT_BACKEND)
+
+logger = logging.getLogger(__name__)
+
+
+def task_options(queue: str) -> Dict[str, Any]:
+    options = settings.CELERY_QUEUES[queue]
+    return {
+        "soft_time_limit": options.soft_time_limit,
+        "time_limit": options.time_limit,
+        "acks_late": options.acks_late
+    }
+
+
+def configure(app: Celery) -> None:
+    """
+    Route every task to its queue and apply the time limits and acks policy of the queue to it.
+    """
+    app.conf.task_routes = {task: {"queue": queue} for task, queue in settings.CELERY_TASK_QUEUES.items()}
+    app.conf.task_annotations = {task: task_options(queue) for task, queue in settings.CELERY_TASK_QUEUES.items()}
+    app.conf.task_ignore_result = settings.CELERY_RESULT_BACKEND is None
+    app.conf.result_expires = settings.CELERY_RESULT_EXPIRES
+
+
+def worker_options(queue: str) -> str:
+    """
+    Command line flags of a worker consuming `queue` with the concurrency and prefetch multiplier of the queue.
+
+    Every queue gets a worker of its own, queues sharing a worker would share its pool and prefetch.
+    """
+    options = settings.CELERY_QUEUES[queue]
+    return f"-Q {queue} -n {queue}@%h -c {options.concurrency} --prefetch-multiplier {options.prefetch_multiplier}"
+
+
+def send_deployment(node_id: str) -> bool:
+    """
+    Queue the deployment of a project, returns whether the broker took it.
+
+    A project whose message never reached the broker stays pending and is queued again by
+    `app.worker.recover_deployments` once PROVISIONING_PENDING_TIMEOUT has passed.
+    """
+    try:
+        celery_app.send_task("app.worker.deploy_project", args=[node_id])
+    except OperationalError:
+        logger.exception("Could not queue the deployment of %s, left for recovery", node_id)
+        return False
+    return True
+
+
+configure(celery_app)
+
+celery_app.conf.beat_schedule = {
+    "rollup-usage": {
+        "task": "app.worker.rollup_usage",
+        "schedule": crontab(minute=5)
+    },
+    "expire-projects": {
+        "task": "app.worker.expire_projects",
+        "schedule": crontab(minute="*/5")
+    },
+    "recover-deployments": {
+        "task": "app.worker.recover_deployments",
+        "schedule": crontab(minute="*/5")
+    },
+    "purge-used-nonces": {
+        "task": "app.worker.purge_used_nonces",
+        "schedule": crontab(minute=35)
+    }
+}
 
-celery_app = Celery("worker", broker="amqp://guest@queue//")
 
-celery_app.conf.task_routes = {"app.worker.test_celery": "main-queue"}
+if __name__ == "__main__":
+    # Flags of one worker per line, for worker-start.sh
+    queues = sys.argv[1].split(",") if len(sys.argv) > 1 else list(settings.CELERY_QUEUES)
+    unknown = [queue for queue in queues if queue not in settings.CELERY_QUEUES]
+    if unknown:
+        sys.exit(f"Unconfigured queues: {', '.join(unknown)}")
+    for queue in queues:
+        print(worker_options(queue))
@@ -1,7 +1,16 @@
 import secrets
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Literal, Optional, Union
 
-from pydantic import AnyHttpUrl, BaseSettings, EmailStr, HttpUrl, PostgresDsn, validator
+from pydantic import AnyHttpUrl, BaseModel, BaseSettings, EmailStr, HttpUrl, PostgresDsn, validator
+
+
+class CeleryQueue(BaseModel):
+    # Worker processes and prefetch apply to the worker consuming the queue, see app.core.celery_app
+    concurrency: int = 1
+    prefetch_multiplier: int = 4
+    soft_time_limit: Optional[int] = None
+    time_limit: Optional[int] = None
+    acks_late: bool = True
 
 
 class Settings(BaseSettings):
@@ -51,6 +60,25 @@ class Settings(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or ''}",
         )
 
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[str] = None
+
+    @validator("SQLALCHEMY_ASYNC_DATABASE_URI", pre=True)
+    def assemble_async_db_connection(cls, v: Optional[str], values: Dict[str, Any]) -> Any:
+        if isinstance(v, str):
+            return v
+        return str(values.get("SQLALCHEMY_DATABASE_URI")).replace("postgresql://", "postgresql+asyncpg://", 1)
+
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_TIMEOUT: int = 30
+    # Connections idle for longer are pinged on checkout, instead of pinging every checkout
+    DB_POOL_PING_IDLE_SECONDS: int = 30
+    # PgBouncer in transaction mode owns the pooling, connections are not kept and no statements are prepared
+    DB_PGBOUNCER: bool = False
+    # Reload interval of the cryptocurrency catalog, changes are normally picked up right away through NOTIFY
+    CRYPTO_CATALOG_MAX_AGE: int = 300
+
     SMTP_TLS: bool = True
     SMTP_PORT: Optional[int] = None
     SMTP_HOST: Optional[str] = None
@@ -60,6 +88,11 @@ class Settings(BaseSettings):
     EMAILS_FROM_NAME: Optional[str] = None
 
     NONCE_MESSAGE: str = ""
+    NONCE_EXPIRE_SECONDS: int = 300
+    # Used nonces each process remembers, the database record is shared by all of them
+    NONCE_CACHE_SIZE: int = 100000
+    SIGNATURE_WORKERS: int = 2
+    SIGNATURE_QUEUE_LIMIT: int = 64
 
     @validator("EMAILS_FROM_NAME")
     def get_project_name(cls, v: Optional[str], values: Dict[str, Any]) -> str:
@@ -84,12 +117,85 @@ class Settings(BaseSettings):
     FIRST_SUPERUSER_PASSWORD: str
     FIRST_PUBLIC_ADDRESS: str
     USERS_OPEN_REGISTRATION: bool = False
+    USER_CACHE_SIZE: int = 10000
+    # Other workers keep serving a changed user until their copy expires
+    USER_CACHE_TTL: int = 5
+    PROJECTS_PAGE_SIZE: int = 100
+    PROJECTS_MAX_PAGE_SIZE: int = 1000
+    PROJECTS_TOTAL_CACHE_TTL: int = 60
+    API_KEYS_CACHE_SIZE: int = 10000
+    API_KEYS_CACHE_TTL: int = 60
 
     PROMETHEUS_URL: str
     PROMETHEUS_USER: str
     PROMETHEUS_PASSWORD: str
     PROMETHEUS_METRIC: str
     PROMETHEUS_NODE_ID_LABEL: str
+    PROMETHEUS_CONNECT_TIMEOUT: float = 3.0
+    PROMETHEUS_READ_TIMEOUT: float = 10.0
+    PROMETHEUS_MAX_CONNECTIONS: int = 20
+    PROMETHEUS_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    PROMETHEUS_KEY_CHUNK_SIZE: int = 200
+    PROMETHEUS_MAX_PARALLEL_QUERIES: int = 4
+    PROMETHEUS_POST_THRESHOLD: int = 2048
+    PROMETHEUS_EXPORT_PAGE_POINTS: int = 1000
+    # Longest range a single usage export may span
+    USAGE_EXPORT_MAX_DAYS: int = 31
+    ANALYTICS_CACHE_SIZE: int = 4096
+    USAGE_ROLLUP_LOOKBACK_HOURS: int = 3
+    # How long the oldest rolled up hour is remembered, charts read Prometheus until the rollups cover them
+    USAGE_ROLLUP_COVERAGE_TTL: int = 300
+
+    EXPIRY_SWEEP_BATCH_SIZE: int = 500
+
+    CELERY_BROKER_URL: str = "amqp://guest@queue//"
+    # No result backend by default, task results are then not stored
+    CELERY_RESULT_BACKEND: Optional[str] = None
+    CELERY_RESULT_EXPIRES: int = 3600
+    # JSON-formatted, merged into the defaults per queue, e.g. '{"provisioning": {"concurrency": 8}}'
+    CELERY_QUEUES: Dict[str, CeleryQueue] = {
+        "main-queue": CeleryQueue(concurrency=1, prefetch_multiplier=4, soft_time_limit=60, time_limit=90),
+        "maintenance": CeleryQueue(concurrency=1, prefetch_multiplier=1, soft_time_limit=600, time_limit=660),
+        "provisioning": CeleryQueue(concurrency=4, prefetch_multiplier=1, soft_time_limit=1800, time_limit=1900)
+    }
+    CELERY_TASK_QUEUES: Dict[str, str] = {
+        "app.worker.test_celery": "main-queue",
+        "app.worker.rollup_usage": "maintenance",
+        "app.worker.backfill_usage": "maintenance",
+        "app.worker.expire_projects": "maintenance",
+        "app.worker.recover_deployments": "maintenance",
+        "app.worker.purge_used_nonces": "maintenance",
+        "app.worker.deploy_project": "provisioning"
+    }
+
+    @validator("CELERY_QUEUES", pre=True)
+    def merge_celery_queues(cls, v: Dict[str, Any]) -> Dict[str, Any]:
+        queues = {name: queue.dict() for name, queue in cls.__fields__["CELERY_QUEUES"].default.items()}
+        for name, options in v.items():
+            if isinstance(options, BaseModel):
+                options = options.dict()
+            queues[name] = {**queues.get(name, {}), **options}
+        return queues
+
+    @validator("CELERY_TASK_QUEUES")
+    def task_queues_exist(cls, v: Dict[str, str], values: Dict[str, Any]) -> Dict[str, str]:
+        unknown = set(v.values()) - set(values.get("CELERY_QUEUES", {}))
+        if unknown:
+            raise ValueError(f"Tasks are routed to unconfigured queues: {', '.join(sorted(unknown))}")
+        return v
+
+    DEPLOYER: Literal["stub"] = "stub"
+    # Deployments running at once per cryptocurrency and network, across all workers
+    PROVISIONING_CONCURRENCY: int = 2
+    PROVISIONING_MAX_RETRIES: int = 5
+    PROVISIONING_RETRY_BACKOFF: int = 30
+    PROVISIONING_RETRY_BACKOFF_MAX: int = 600
+    # Delay before a deployment waiting for a free slot is tried again
+    PROVISIONING_SLOT_WAIT: int = 15
+    # Abandoned deployments handed back to the queue per recovery sweep
+    PROVISIONING_RECOVERY_BATCH_SIZE: int = 100
+    # Seconds a project may stay pending before its deployment counts as lost, above the longest retry backoff
+    PROVISIONING_PENDING_TIMEOUT: int = 1800
 
     class Config:
         case_sensitive = True
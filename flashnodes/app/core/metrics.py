@@ -0,0 +1,41 @@
+import threading
+from typing import Any, Callable, Dict
+
+_registry: Dict[str, Callable[[], Any]] = {}
+
+
+class LatencyStats:
+    def __init__(self) -> None:
+        """
+        Running count, total and maximum of observed durations in seconds.
+        """
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "count": self.count,
+                "total": round(self.total, 6),
+                "average": round(self.total / self.count, 6) if self.count else 0.0,
+                "max": round(self.max, 6)
+            }
+
+
+def register(name: str, collect: Callable[[], Any]) -> None:
+    """
+    Publish the value returned by `collect` under `name` in every snapshot.
+    """
+    _registry[name] = collect
+
+
+def snapshot() -> Dict[str, Any]:
+    return {name: collect() for name, collect in _registry.items()}
@@ -1,5 +1,10 @@
+import base64
+import hashlib
+import hmac
+import secrets
+import time
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Optional, Union
 
 from jose import jwt
 from passlib.context import CryptContext
@@ -32,3 +37,40 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
+
+
+def _sign_nonce(public_address: str, issued_at: str, salt: str) -> str:
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(), f"{public_address}:{issued_at}:{salt}".encode(), hashlib.sha256
+    ).digest()
+    return base64.urlsafe_b64encode(digest[:18]).decode()
+
+
+def generate_login_nonce(public_address: str) -> str:
+    """
+    Stateless login nonce for the address, `NONCE_MESSAGE<issued at>.<salt>.<hmac>`.
+    """
+    issued_at = str(int(time.time()))
+    salt = secrets.token_urlsafe(9)
+    return f"{settings.NONCE_MESSAGE}{issued_at}.{salt}.{_sign_nonce(public_address, issued_at, salt)}"
+
+
+def login_nonce_token(public_address: str, nonce: str) -> Optional[str]:
+    """
+    The token part of a nonce issued for the address that has not expired, None otherwise.
+
+    Whether it was used already is recorded by `crud.nonces`, under this token.
+    """
+    if not nonce.startswith(settings.NONCE_MESSAGE):
+        return None
+    token = nonce[len(settings.NONCE_MESSAGE):]
+    try:
+        issued_at, salt, signature = token.split(".")
+        age = time.time() - int(issued_at)
+    except ValueError:
+        return None
+    if not 0 <= age <= settings.NONCE_EXPIRE_SECONDS:
+        return None
+    if not hmac.compare_digest(signature, _sign_nonce(public_address, issued_at, salt)):
+        return None
+    return token
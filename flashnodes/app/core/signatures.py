@@ -0,0 +1,87 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import Optional, Tuple
+
+from eth_account import Account, messages
+
+from app.core import metrics
+from app.core.config import settings
+
+queue_wait = metrics.LatencyStats()
+verification_time = metrics.LatencyStats()
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+
+class VerificationUnavailable(Exception):
+    pass
+
+
+class VerificationOverloaded(VerificationUnavailable):
+    pass
+
+
+def recover_signer(text: str, signature: str) -> Tuple[Optional[str], float]:
+    """
+    Runs in a pool process, returns the signing address (None for a malformed signature) and the time it took.
+    """
+    started = time.perf_counter()
+    try:
+        address = Account.recover_message(messages.encode_defunct(text=text), signature=signature)
+    except Exception:
+        address = None
+    return address, time.perf_counter() - started
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # Forking would copy the threads and open connections of the app into the pool processes
+        _executor = ProcessPoolExecutor(max_workers=settings.SIGNATURE_WORKERS, mp_context=get_context("spawn"))
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+async def recover_address(text: str, signature: str) -> Optional[str]:
+    """
+    Recover the address that signed `text` without holding the event loop or the GIL.
+
+    Raises VerificationOverloaded when SIGNATURE_QUEUE_LIMIT verifications are already waiting and
+    VerificationUnavailable when a pool process died, the next call starts a new pool.
+    """
+    global _pending
+    if _pending >= settings.SIGNATURE_QUEUE_LIMIT:
+        raise VerificationOverloaded()
+    _pending += 1
+    submitted = time.perf_counter()
+    executor = get_executor()
+    try:
+        address, elapsed = await asyncio.get_running_loop().run_in_executor(
+            executor, recover_signer, text, signature
+        )
+    except BrokenProcessPool:
+        if executor is _executor:
+            shutdown_executor()
+        raise VerificationUnavailable()
+    finally:
+        _pending -= 1
+    verification_time.observe(elapsed)
+    queue_wait.observe(max(time.perf_counter() - submitted - elapsed, 0))
+    return address
+
+
+metrics.register("signature_verification", lambda: {
+    "pending": _pending,
+    "queue_wait": queue_wait.snapshot(),
+    "verification_time": verification_time.snapshot()
+})
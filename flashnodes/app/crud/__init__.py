@@ -1,5 +1,7 @@
 from .crud_cryptocurrencies import crypto
+from .crud_nonces import nonces
 from .crud_projects import projects
+from .crud_usage import usage
 from .crud_user import user
 
 # For a new basic set of CRUD operations you could just do
@@ -1,43 +1,110 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.crud.base import CRUDBase
+from app.db.session import SessionLocal
 from app.models.cryptocurrencies import Cryptocurrencies
-from app.schemas.cryptocurrency import Cryptocurrency
+from app.schemas.cryptocurrency import Cryptocurrency, CryptocurrencyDB
+
+# NOTIFY channel of catalog changes, see app.db.listener
+CATALOG_CHANNEL = "cryptocurrencies_changed"
+
+
+class CryptoCatalog:
+    def __init__(self, max_age: float) -> None:
+        """
+        Immutable snapshot of the cryptocurrencies table, replaced as a whole on every reload.
+
+        **Parameters**
+
+        * `max_age`: Seconds after which a read reloads the snapshot, in case a notification was missed
+        """
+        self.max_age = max_age
+        self.loaded_at = 0.0
+        self.items: List[CryptocurrencyDB] = []
+        self.by_symbol: Dict[str, CryptocurrencyDB] = {}
+        self._lock = threading.Lock()
+
+    def load(self, db: Optional[Session] = None) -> None:
+        """
+        Read the table with `db`, or a session of its own for callers that have none.
+        """
+        if db is None:
+            with SessionLocal() as db:
+                return self.load(db)
+        items = [CryptocurrencyDB.construct(
+            id=row.id,
+            full_name=row.full_name,
+            symbol=row.symbol,
+            details=row.details
+        ) for row in db.query(Cryptocurrencies).order_by(Cryptocurrencies.id).all()]
+        with self._lock:
+            self.items = items
+            self.by_symbol = {item.symbol: item for item in items}
+            self.loaded_at = time.monotonic()
+
+    def expire(self) -> None:
+        self.loaded_at = 0.0
+
+    def get(self, db: Optional[Session] = None) -> "CryptoCatalog":
+        if time.monotonic() - self.loaded_at > self.max_age:
+            self.load(db)
+        return self
+
+
+catalog = CryptoCatalog(max_age=settings.CRYPTO_CATALOG_MAX_AGE)
 
 
 class CRUDCryptocurrencies(CRUDBase[Cryptocurrencies, Cryptocurrency, Cryptocurrency]):
-    def create(self, db: Session, obj_in: Cryptocurrency):
+    def notify_changed(self, db: Session) -> None:
+        """
+        Commit with a notification, so every worker reloads its catalog once the change is visible.
+        """
+        db.execute(text(f"NOTIFY {CATALOG_CHANNEL}"))
+        db.commit()
+        catalog.load(db)
+
+    def create(self, db: Session, obj_in: Cryptocurrency) -> Cryptocurrencies:
         db_obj = Cryptocurrencies(
             full_name=obj_in.full_name,
             symbol=obj_in.symbol,
             details=obj_in.details
         )
         db.add(db_obj)
-        db.commit()
+        self.notify_changed(db)
         db.refresh(db_obj)
         return db_obj
 
-    def exists(self, db: Session, symbol: str):
-        return db.query(Cryptocurrencies).filter(Cryptocurrencies.symbol == symbol).first() is not None
+    def exists(self, db: Session, symbol: str) -> bool:
+        return symbol in catalog.get(db).by_symbol
 
-    def get_all(self, db: Session):
-        return db.query(Cryptocurrencies).all()
+    def get_all(self, db: Optional[Session] = None) -> List[CryptocurrencyDB]:
+        return catalog.get(db).items
 
-    def get_by_id(self, db: Session, cryptocurrency_id: int):
+    def get_by_id(self, db: Session, cryptocurrency_id: int) -> Optional[Cryptocurrencies]:
         return db.query(Cryptocurrencies).filter(Cryptocurrencies.id == cryptocurrency_id).first()
 
-    def get_by_symbol(self, db: Session, symbol: str):
-        return db.query(Cryptocurrencies).filter(Cryptocurrencies.symbol == symbol).first()
+    def get_by_symbol(self, db: Session, symbol: str) -> Optional[CryptocurrencyDB]:
+        return catalog.get(db).by_symbol.get(symbol)
 
-    def delete_by_id(self, db: Session, cryptocurrency_id: int):
+    def delete_by_id(self, db: Session, cryptocurrency_id: int) -> None:
         db.query(Cryptocurrencies).filter(Cryptocurrencies.id == cryptocurrency_id).delete()
-        db.commit()
+        self.notify_changed(db)
 
     def update(
         self, db: Session, db_obj: Cryptocurrencies, obj_in: Cryptocurrency
     ) -> Cryptocurrencies:
-        update_data = obj_in.dict(exclude_unset=True)
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        for field, value in obj_in.dict(exclude_unset=True).items():
+            setattr(db_obj, field, value)
+        db.add(db_obj)
+        self.notify_changed(db)
+        db.refresh(db_obj)
+        return db_obj
 
 
 crypto = CRUDCryptocurrencies(Cryptocurrencies)
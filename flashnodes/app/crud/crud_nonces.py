@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from sqlalchemy import exists
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.models.nonces import UsedNonces
+
+
+class CRUDNonces:
+    def __init__(self, cache: TTLCache):
+        """
+        Login nonces already presented, recorded in the database so every worker turns a replay away.
+
+        **Parameters**
+
+        * `cache`: Nonces this process saw used, answers repeats without a query
+        """
+        self.cache = cache
+
+    def is_used(self, db: Session, token: str) -> bool:
+        if self.cache.get(token):
+            return True
+        return db.query(exists().where(UsedNonces.token == token)).scalar()
+
+    def consume(self, db: Session, token: str, expires_at: datetime) -> bool:
+        """
+        Record the nonce as used, returns False when it was recorded before, by this or any other worker.
+        """
+        if self.cache.get(token):
+            return False
+        inserted = db.execute(
+            insert(UsedNonces).values(token=token, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=[UsedNonces.token])
+            .returning(UsedNonces.token)
+        ).scalar()
+        db.commit()
+        self.cache.set(token, True)
+        return inserted is not None
+
+    def purge_expired(self, db: Session, now: datetime) -> int:
+        """
+        Delete nonces that expired anyway, returns how many.
+        """
+        deleted = db.query(UsedNonces).filter(UsedNonces.expires_at < now).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
+
+nonces = CRUDNonces(TTLCache(maxsize=settings.NONCE_CACHE_SIZE, ttl=settings.NONCE_EXPIRE_SECONDS))
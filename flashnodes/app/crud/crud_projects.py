@@ -1,18 +1,43 @@
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Union
+from uuid import UUID
 
-from sqlalchemy import desc
+from sqlalchemy import any_, bindparam, delete, desc, func, select, text, update
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.crud.base import CRUDBase
 from app.models import User
 from app.models.projects import Projects
 from app.models.cryptocurrencies import Cryptocurrencies
 from app.schemas import Project, ProjectDB
 
+# Exact project count for the admin listing, see CRUDProjects.get_total_cached
+total_cache = TTLCache(maxsize=1, ttl=settings.PROJECTS_TOTAL_CACHE_TTL)
+# Api keys of recently active owners by user id, see CRUDProjects.get_all_api_keys
+api_keys_cache = TTLCache(maxsize=settings.API_KEYS_CACHE_SIZE, ttl=settings.API_KEYS_CACHE_TTL)
+
+# Columns of a project listing row, see app.api.serializers.serialize_project
+PROJECT_COLUMNS = (
+    Projects.node_id,
+    Projects.cryptocurrency_symbol,
+    Cryptocurrencies.full_name.label("cryptocurrency_full_name"),
+    Projects.mode,
+    Projects.network,
+    Projects.is_paid,
+    Projects.paid_until,
+    Projects.created_on,
+    Projects.api_key,
+    Projects.status,
+    Projects.prefix
+)
+
 
 class CRUDProjects(CRUDBase[Projects, Project, Project]):
-    def create(self, db: Session, obj_in: ProjectDB):
+    def create(self, db: Session, obj_in: ProjectDB) -> Projects:  # type: ignore[override]
         db_obj = Projects(
             user_id=obj_in.user_id,
             cryptocurrency_symbol=obj_in.cryptocurrency_symbol,
@@ -24,44 +49,89 @@ class CRUDProjects(CRUDBase[Projects, Project, Project]):
         db.add(db_obj)
         db.commit()
         db.refresh(db_obj)
+        total_cache.clear()
+        api_keys_cache.invalidate(db_obj.user_id)
         return db_obj
 
-    def get_all(self, db: Session, user_id: int, limit: int = None, offset: int = None):
-        return db.query(Projects, Cryptocurrencies.full_name).join(
+    def get_all(
+        self, db: Session, user_id: int, limit: Optional[int] = None, offset: Optional[int] = None
+    ) -> List[Any]:
+        return db.query(*PROJECT_COLUMNS).join(
             Cryptocurrencies, Cryptocurrencies.symbol == Projects.cryptocurrency_symbol
         ).filter(Projects.user_id == user_id).limit(limit).offset(offset).all()
 
-    def get_all_internal(self, db: Session, limit: int = None, offset: int = None):
-        return db.query(Projects, Cryptocurrencies.full_name, User.public_address).join(
+    async def get_all_async(
+        self, db: AsyncSession, user_id: int, limit: Optional[int] = None, offset: Optional[int] = None
+    ) -> List[Any]:
+        result = await db.execute(select(*PROJECT_COLUMNS).join(
+            Cryptocurrencies, Cryptocurrencies.symbol == Projects.cryptocurrency_symbol
+        ).where(Projects.user_id == user_id).limit(limit).offset(offset))
+        return result.all()
+
+    def get_all_internal(self, db: Session, limit: Optional[int] = None, before_id: Optional[int] = None,
+                         offset: Optional[int] = None) -> List[Any]:
+        """
+        Newest projects first, `before_id` seeks past the last project of the previous page on the primary key.
+
+        `offset` only serves clients that have not moved to the cursor yet, it reads every skipped row.
+        """
+        query = db.query(Projects.id, *PROJECT_COLUMNS, User.public_address).join(
             Cryptocurrencies, Cryptocurrencies.symbol == Projects.cryptocurrency_symbol
         ).join(
             User, User.id == Projects.user_id
-        ).filter().order_by(desc(Projects.id)).limit(limit).offset(offset).all()
+        )
+        if before_id is not None:
+            query = query.filter(Projects.id < before_id)
+        return query.order_by(desc(Projects.id)).limit(limit).offset(offset).all()
 
-    def get_total_amount(self, db: Session):
+    def get_total_amount(self, db: Session) -> int:
         return db.query(Projects).count()
 
-    def get_by_id(self, db: Session, project_id: int, user_id: int):
+    def get_total_cached(self, db: Session) -> int:
+        total = total_cache.get("total")
+        if total is None:
+            total = self.get_total_amount(db)
+            total_cache.set("total", total)
+        return total
+
+    def get_total_estimate(self, db: Session) -> int:
+        """
+        Planner row estimate of the table, falls back to the cached count before the first ANALYZE.
+        """
+        estimate = db.execute(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = CAST(:table AS regclass)"),
+            {"table": Projects.__tablename__}
+        ).scalar()
+        if estimate is None or estimate < 0:
+            return self.get_total_cached(db)
+        return estimate
+
+    def get_by_id(self, db: Session, project_id: int, user_id: int) -> Optional[Projects]:
         return db.query(Projects).filter(Projects.id == project_id,
                                          Projects.user_id == user_id).first()
 
-    def get_by_node_id(self, db: Session, node_id: int, user_id: int):
+    def get_by_node_id(self, db: Session, node_id: Union[str, UUID], user_id: int) -> Optional[Any]:
         return db.query(Projects, Cryptocurrencies.full_name).join(
             Cryptocurrencies, Cryptocurrencies.symbol == Projects.cryptocurrency_symbol
         ).filter(Projects.node_id == node_id, Projects.user_id == user_id).first()
 
-    def get_by_node_id_internal(self, db: Session, node_id: str):
+    def get_by_node_id_internal(self, db: Session, node_id: str) -> Optional[Any]:
         return db.query(Projects, User.public_address).filter(Projects.node_id == node_id).join(
             User, User.id == Projects.user_id
         ).first()
 
-    def delete_by_node_id_internal(self, db: Session, node_id: int):
-        db.query(Projects).filter(Projects.node_id == node_id).delete()
+    def delete_by_node_id_internal(self, db: Session, node_id: str) -> None:
+        user_ids = db.execute(
+            delete(Projects).where(Projects.node_id == node_id).returning(Projects.user_id)
+        ).scalars().all()
         db.commit()
+        total_cache.clear()
+        for user_id in user_ids:
+            api_keys_cache.invalidate(user_id)
 
     def manage_by_node_id_internal(self, db: Session, db_obj: Projects, paid_until: Optional[datetime] = None,
-                                   is_paid: bool = None, set_status: str = None):
-        obj_in = {}
+                                   is_paid: Optional[bool] = None, set_status: Optional[str] = None) -> Projects:
+        obj_in: Dict[str, Any] = {}
         if is_paid:
             obj_in["is_paid"] = is_paid
         if paid_until:
@@ -70,19 +140,108 @@ class CRUDProjects(CRUDBase[Projects, Project, Project]):
             obj_in["status"] = set_status
         return super().update(db, db_obj=db_obj, obj_in=obj_in)
 
-    def list_projects_by_public_address(self, db: Session, public_address: str):
-        return db.query(Projects, Cryptocurrencies.full_name, User.public_address).join(
-            Cryptocurrencies, Cryptocurrencies.symbol == Projects.cryptocurrency_symbol
-        ).join(
-            User, User.public_address == public_address
+    def manage_many_internal(self, db: Session, node_ids: Sequence[UUID], values: Dict[str, Any]) -> List[Any]:
+        """
+        Apply the same changes to every listed project in one statement, returns the rows that were updated.
+        """
+        node_id_array = bindparam("node_ids", list(node_ids), type_=postgresql.ARRAY(postgresql.UUID(as_uuid=True)))
+        rows = db.execute(
+            update(Projects).where(Projects.node_id == any_(node_id_array)).values(**values).returning(
+                Projects.node_id, Projects.status, Projects.is_paid, Projects.paid_until
+            ).execution_options(synchronize_session=False)
         ).all()
+        db.commit()
+        return rows
+
+    def transition(self, db: Session, node_id: Union[str, UUID], from_statuses: Sequence[str], to_status: str) -> bool:
+        """
+        Move the project to `to_status` only if it is in one of `from_statuses`, returns whether it moved.
+        """
+        moved = db.query(Projects).filter(
+            Projects.node_id == node_id, Projects.status.in_(from_statuses)
+        ).update({"status": to_status, "status_changed_on": func.now()}, synchronize_session=False)
+        db.commit()
+        return moved > 0
+
+    def get_node_ids_by_status(self, db: Session, status: str, limit: int,
+                               unchanged_for: Optional[timedelta] = None) -> List[UUID]:
+        """
+        Node ids of up to `limit` projects in `status`, only those whose status the provisioning tasks
+        last changed more than `unchanged_for` ago if given.
+        """
+        query = db.query(Projects.node_id).filter(Projects.status == status)
+        if unchanged_for is not None:
+            query = query.filter(Projects.status_changed_on < func.now() - unchanged_for)
+        return [node_id for node_id, in query.order_by(Projects.status_changed_on).limit(limit).all()]
+
+    def expire_overdue(self, db: Session, now: datetime, limit: int) -> List[UUID]:
+        """
+        Expire up to `limit` active projects paid until before `now`, returns their node ids.
+
+        Rows locked by a concurrent update are skipped and left for the next batch.
+        """
+        overdue = select(Projects.id).where(
+            Projects.status == "active", Projects.paid_until < now
+        ).order_by(Projects.paid_until).limit(limit).with_for_update(skip_locked=True)
+        node_ids = db.execute(
+            update(Projects).where(Projects.id.in_(overdue.scalar_subquery())).values(status="expired").returning(
+                Projects.node_id
+            ).execution_options(synchronize_session=False)
+        ).scalars().all()
+        db.commit()
+        return node_ids
 
-    def get_api_key_by_node_id(self, db: Session, user_id: int, node_id: str):
-        return db.query(Projects.api_key).filter(User.id == user_id,
+    def list_projects_by_public_addresses(self, db: Session, public_addresses: List[str]) -> List[Any]:
+        """
+        Projects of the given owners, resolved through the unique public address and the user_id index.
+        """
+        return db.query(*PROJECT_COLUMNS, User.public_address).join(
+            User, User.id == Projects.user_id
+        ).join(
+            Cryptocurrencies, Cryptocurrencies.symbol == Projects.cryptocurrency_symbol
+        ).filter(User.public_address.in_(public_addresses)).order_by(desc(Projects.id)).all()
+
+    def get_api_key_by_node_id(self, db: Session, user_id: int, node_id: Union[str, UUID]) -> Optional[Any]:
+        return db.query(Projects.api_key).filter(Projects.user_id == user_id,
                                                  Projects.node_id == node_id).first()
 
-    def get_all_api_keys(self, db: Session, user_id: int):
-        return db.query(Projects.api_key).join(User, User.id == user_id).all()
+    async def get_api_key_by_node_id_async(
+        self, db: AsyncSession, user_id: int, node_id: Union[str, UUID]
+    ) -> Optional[Any]:
+        result = await db.execute(select(Projects.api_key).where(Projects.user_id == user_id,
+                                                                 Projects.node_id == node_id))
+        return result.first()
+
+    def get_all_api_keys(self, db: Session, user_id: int) -> List[str]:
+        """
+        Api keys of the owner's projects, cached per user until a project is created or deleted.
+        """
+        api_keys = api_keys_cache.get(user_id)
+        if api_keys is None:
+            api_keys = [str(api_key) for api_key, in
+                        db.query(Projects.api_key).filter(Projects.user_id == user_id).all()]
+            api_keys_cache.set(user_id, api_keys)
+        return list(api_keys)
+
+    async def get_all_api_keys_async(self, db: AsyncSession, user_id: int) -> List[str]:
+        api_keys = api_keys_cache.get(user_id)
+        if api_keys is None:
+            result = await db.execute(select(Projects.api_key).where(Projects.user_id == user_id))
+            api_keys = [str(api_key) for api_key in result.scalars().all()]
+            api_keys_cache.set(user_id, api_keys)
+        return list(api_keys)
+
+    def get_owners_by_api_keys(self, db: Session, api_keys: List[str]) -> List[Any]:
+        return db.query(Projects.api_key, Projects.node_id, Projects.cryptocurrency_symbol, User.public_address).join(
+            User, User.id == Projects.user_id
+        ).filter(Projects.api_key.in_(api_keys)).all()
+
+    def get_node_ids_by_api_key(self, db: Session, user_id: int) -> Dict[UUID, UUID]:
+        return dict(db.query(Projects.api_key, Projects.node_id).filter(Projects.user_id == user_id).all())
+
+    async def get_node_ids_by_api_key_async(self, db: AsyncSession, user_id: int) -> Dict[UUID, UUID]:
+        result = await db.execute(select(Projects.api_key, Projects.node_id).where(Projects.user_id == user_id))
+        return dict(result.all())
 
 
 projects = CRUDProjects(Projects)
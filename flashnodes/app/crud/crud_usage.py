@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.crud.base import CRUDBase
+from app.models.usage import UsageRollups
+from app.schemas import UsageRollup
+
+
+class CRUDUsage(CRUDBase[UsageRollups, UsageRollup, UsageRollup]):
+    def upsert_hour(self, db: Session, bucket_start: datetime, requests: Dict[str, int]) -> None:
+        if not requests:
+            return
+        statement = insert(UsageRollups).values([{
+            "api_key": api_key,
+            "granularity": "hour",
+            "bucket_start": bucket_start,
+            "requests": value
+        } for api_key, value in requests.items()])
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[UsageRollups.api_key, UsageRollups.bucket_start, UsageRollups.granularity],
+            set_={"requests": statement.excluded.requests}
+        ))
+        db.commit()
+
+    def rollup_day(self, db: Session, day_start: datetime) -> None:
+        """
+        Recompute the daily rows of a day from its hourly rows.
+        """
+        hourly = db.query(
+            UsageRollups.api_key,
+            literal("day"),
+            literal(day_start),
+            func.sum(UsageRollups.requests)
+        ).filter(
+            UsageRollups.granularity == "hour",
+            UsageRollups.bucket_start >= day_start,
+            UsageRollups.bucket_start < day_start + timedelta(days=1)
+        ).group_by(UsageRollups.api_key)
+        statement = insert(UsageRollups).from_select(
+            ["api_key", "granularity", "bucket_start", "requests"], hourly
+        )
+        db.execute(statement.on_conflict_do_update(
+            index_elements=[UsageRollups.api_key, UsageRollups.bucket_start, UsageRollups.granularity],
+            set_={"requests": statement.excluded.requests}
+        ))
+        db.commit()
+
+    async def get_series_async(self, db: AsyncSession, api_keys: Sequence[str], granularity: str,
+                               start: datetime, end: datetime) -> List[Tuple[float, int]]:
+        """
+        Requests summed over the given keys per bucket, as `(unix timestamp, requests)` pairs.
+        """
+        result = await db.execute(select(
+            func.extract("epoch", UsageRollups.bucket_start),
+            func.sum(UsageRollups.requests)
+        ).where(
+            UsageRollups.api_key.in_(api_keys),
+            UsageRollups.granularity == granularity,
+            UsageRollups.bucket_start >= start,
+            UsageRollups.bucket_start < end
+        ).group_by(UsageRollups.bucket_start))
+        return result.all()
+
+    async def get_first_hour_async(self, db: AsyncSession) -> Optional[float]:
+        """
+        Unix timestamp of the oldest hourly row, None while nothing is rolled up.
+        """
+        result = await db.execute(select(
+            func.extract("epoch", func.min(UsageRollups.bucket_start))
+        ).where(UsageRollups.granularity == "hour"))
+        return result.scalar()
+
+
+usage = CRUDUsage(UsageRollups)
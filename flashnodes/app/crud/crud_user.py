@@ -3,20 +3,24 @@ from typing import Any, Dict, Optional, Union
 from sqlalchemy import true
 from sqlalchemy.orm import Session
 
+from app.core.cache import TTLCache
+from app.core.config import settings
 from app.core.security import get_password_hash, verify_password
 from app.crud.base import CRUDBase
 from app.models.user import User
-from app.schemas.user import UserCreate, UserMetamaskCreateDB, UserUpdate
+from app.schemas.user import UserCreate, UserMetamaskCreate, UserUpdate
+
+# Column values of recently authenticated users by id, see deps.get_current_user
+user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL)
 
 
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
         return db.query(User).filter(User.email == email).first()
 
-    def create_metamask(self, db: Session, obj_in: UserMetamaskCreateDB):
+    def create_metamask(self, db: Session, obj_in: UserMetamaskCreate):
         db_obj = User(
-            public_address=obj_in.public_address,
-            nonce=obj_in.nonce
+            public_address=obj_in.public_address
         )
         db.add(db_obj)
         db.commit()
@@ -38,6 +42,7 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         super().update(db, db_obj=db_obj, obj_in={
             "nonce": nonce
         })
+        user_cache.invalidate(db_obj.id)
 
     def update(
         self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
@@ -50,7 +55,14 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
             hashed_password = get_password_hash(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        db_obj = super().update(db, db_obj=db_obj, obj_in=update_data)
+        user_cache.invalidate(db_obj.id)
+        return db_obj
+
+    def remove(self, db: Session, *, id: int) -> User:
+        user = super().remove(db, id=id)
+        user_cache.invalidate(id)
+        return user
 
     def authenticate(self, db: Session, *, email: str, password: str) -> Optional[User]:
         user = self.get_by_email(db, email=email)
@@ -2,5 +2,7 @@
 # imported by Alembic
 from app.db.base_class import Base  # noqa
 from app.models.cryptocurrencies import Cryptocurrencies  # noqa
+from app.models.nonces import UsedNonces  # noqa
 from app.models.projects import Projects  # noqa
+from app.models.usage import UsageRollups  # noqa
 from app.models.user import User  # noqa
@@ -0,0 +1,71 @@
+import logging
+import select
+import threading
+from typing import Callable, Dict, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationListener(threading.Thread):
+    def __init__(self, handlers: Dict[str, Callable[[], None]], timeout: float = 5.0,
+                 retry_delay: float = 5.0) -> None:
+        """
+        Daemon thread that LISTENs on a dedicated connection and calls the handler of every notified channel.
+
+        Handlers are also called after every reconnect, notifications sent while disconnected are lost.
+
+        **Parameters**
+
+        * `handlers`: Callback per channel name
+        * `timeout`: Seconds between checks whether the listener was stopped
+        * `retry_delay`: Seconds to wait before reconnecting after an error
+        """
+        super().__init__(name="notification-listener", daemon=True)
+        self.handlers = handlers
+        self.timeout = timeout
+        self.retry_delay = retry_delay
+        self._stopped = threading.Event()
+
+    def connect(self) -> psycopg2.extensions.connection:
+        connection = psycopg2.connect(str(settings.SQLALCHEMY_DATABASE_URI))
+        connection.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with connection.cursor() as cursor:
+            for channel in self.handlers:
+                cursor.execute(f'LISTEN "{channel}"')
+        return connection
+
+    def dispatch(self, channel: str) -> None:
+        try:
+            self.handlers[channel]()
+        except Exception:
+            logger.exception("Handler of %s notifications failed", channel)
+
+    def run(self) -> None:
+        while not self._stopped.is_set():
+            connection: Optional[psycopg2.extensions.connection] = None
+            try:
+                connection = self.connect()
+                for channel in self.handlers:
+                    self.dispatch(channel)
+                while not self._stopped.is_set():
+                    if select.select([connection], [], [], self.timeout) == ([], [], []):
+                        continue
+                    connection.poll()
+                    channels = {notify.channel for notify in connection.notifies}
+                    connection.notifies.clear()
+                    for channel in channels & self.handlers.keys():
+                        self.dispatch(channel)
+            except psycopg2.Error:
+                logger.warning("Notification listener disconnected, reconnecting", exc_info=True)
+                self._stopped.wait(self.retry_delay)
+            finally:
+                if connection is not None:
+                    connection.close()
+
+    def stop(self) -> None:
+        self._stopped.set()
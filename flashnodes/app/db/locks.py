@@ -0,0 +1,69 @@
+import zlib
+from contextlib import contextmanager
+from typing import Iterator
+
+from sqlalchemy import func, select
+from sqlalchemy.engine import Connection
+
+from app.db.session import engine
+
+# Keys of application-wide advisory locks, unique across the database
+EXPIRY_SWEEP_LOCK = 1001
+DEPLOYMENT_LOCK = 1002
+
+
+def lock_key(name: str) -> int:
+    """
+    Stable signed 32 bit key for the two-key form of the advisory lock functions.
+    """
+    return (zlib.crc32(name.encode()) ^ 0x80000000) - 0x80000000
+
+
+@contextmanager
+def lock_connection() -> Iterator[Connection]:
+    """
+    Dedicated connection whose transaction holds the advisory locks taken on it until the block exits.
+
+    The locks are released with the transaction, also when the worker dies, and work through PgBouncer
+    transaction pooling.
+    """
+    with engine.begin() as connection:
+        yield connection
+
+
+def try_advisory_lock(connection: Connection, *keys: int) -> bool:
+    return connection.execute(select(func.pg_try_advisory_xact_lock(*keys))).scalar()
+
+
+@contextmanager
+def advisory_lock(*keys: int) -> Iterator[bool]:
+    """
+    Try to take a transaction-level advisory lock on a dedicated connection and hold it until the block exits.
+
+    Yields whether the lock was taken.
+    """
+    with lock_connection() as connection:
+        yield try_advisory_lock(connection, *keys)
+
+
+def try_deployment_slot(connection: Connection, cryptocurrency_symbol: str, network: str, slots: int) -> bool:
+    """
+    Take one of `slots` advisory locks of the cryptocurrency and network, returns whether a slot was free.
+    """
+    key = lock_key(f"provisioning:{cryptocurrency_symbol}:{network}")
+    return any(try_advisory_lock(connection, key, slot) for slot in range(slots))
+
+
+def try_deployment_lock(connection: Connection, node_id: str) -> bool:
+    """
+    Lock of a single project, held by the worker deploying it. Returns whether the lock was taken.
+
+    A project left in deploying whose lock is free was abandoned, e.g. by a worker killed at its hard time limit.
+    """
+    return try_advisory_lock(connection, DEPLOYMENT_LOCK, lock_key(node_id))
+
+
+@contextmanager
+def deployment_lock(node_id: str) -> Iterator[bool]:
+    with lock_connection() as connection:
+        yield try_deployment_lock(connection, node_id)
@@ -1,7 +1,22 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
+from app.core import metrics
 from app.core.config import settings
+from app.db.pool import ping_idle_connections, pool_options, pool_stats
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, **pool_options())
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async_engine = create_async_engine(settings.SQLALCHEMY_ASYNC_DATABASE_URI, **pool_options(asyncio=True))
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+if not settings.DB_PGBOUNCER:
+    ping_idle_connections(engine)
+    ping_idle_connections(async_engine.sync_engine)
+
+metrics.register("db_pool", lambda: {
+    "sync": pool_stats(engine),
+    "async": pool_stats(async_engine.sync_engine)
+})
@@ -0,0 +1,74 @@
+import abc
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Type
+
+from app.core.config import settings
+
+
+@dataclass(frozen=True)
+class Deployment:
+    node_id: str
+    cryptocurrency_symbol: str
+    network: str
+    mode: str
+    prefix: str
+
+
+class DeploymentError(Exception):
+    """
+    A deployment failed in a way that may succeed when retried.
+    """
+
+
+class Deployer(abc.ABC):
+    @abc.abstractmethod
+    def deploy(self, deployment: Deployment) -> None:
+        """
+        Bring the node up, returns once it serves requests.
+
+        Must be safe to call again for a node that is already (partially) deployed.
+        """
+
+
+class StubDeployer(Deployer):
+    def __init__(self, delay: float = 0.0, failures: int = 0) -> None:
+        """
+        Deployer for local development and tests, only records what it was asked to deploy.
+
+        **Parameters**
+
+        * `delay`: Seconds every deployment takes
+        * `failures`: Number of calls per node that raise `DeploymentError` before one succeeds
+        """
+        self.delay = delay
+        self.failures = failures
+        self.deployed: List[Deployment] = []
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def deploy(self, deployment: Deployment) -> None:
+        with self._lock:
+            attempt = self._attempts.get(deployment.node_id, 0) + 1
+            self._attempts[deployment.node_id] = attempt
+        if self.delay:
+            time.sleep(self.delay)
+        if attempt <= self.failures:
+            raise DeploymentError(f"Stub failure {attempt} of {self.failures} for {deployment.node_id}")
+        with self._lock:
+            self.deployed.append(deployment)
+
+
+DEPLOYERS: Dict[str, Type[Deployer]] = {
+    "stub": StubDeployer
+}
+
+_deployer = None
+
+
+def get_deployer() -> Deployer:
+    global _deployer
+    if _deployer is None:
+        _deployer = DEPLOYERS[settings.DEPLOYER]()
+    return _deployer
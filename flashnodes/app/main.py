@@ -3,6 +3,10 @@ from starlette.middleware.cors import CORSMiddleware
 
 from app.api.api_v1.api import api_router
 from app.core.config import settings
+from app.core.signatures import shutdown_executor
+from app.crud.crud_cryptocurrencies import CATALOG_CHANNEL, catalog
+from app.db.listener import NotificationListener
+from app.prometheus import close_client
 
 app = FastAPI(
     title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
@@ -19,3 +23,33 @@ if settings.BACKEND_CORS_ORIGINS:
     )
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+listener = NotificationListener({CATALOG_CHANNEL: catalog.expire})
+
+
+@app.on_event("startup")
+def load_crypto_catalog() -> None:
+    # The first requests are served from memory instead of all reloading the catalog at once
+    catalog.load()
+
+
+@app.on_event("startup")
+def start_notification_listener() -> None:
+    # PgBouncer transaction pooling does not deliver notifications, the catalog max age applies alone
+    if not settings.DB_PGBOUNCER:
+        listener.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_prometheus_client() -> None:
+    await close_client()
+
+
+@app.on_event("shutdown")
+def shutdown_signature_executor() -> None:
+    shutdown_executor()
+
+
+@app.on_event("shutdown")
+def stop_notification_listener() -> None:
+    listener.stop()
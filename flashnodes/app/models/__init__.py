@@ -1,3 +1,5 @@
 from .cryptocurrencies import Cryptocurrencies
+from .nonces import UsedNonces
 from .projects import Projects
+from .usage import UsageRollups
 from .user import User
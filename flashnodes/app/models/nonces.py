@@ -0,0 +1,14 @@
+from sqlalchemy import TIMESTAMP, VARCHAR, Column, Index
+
+from app.db.base_class import Base
+
+
+class UsedNonces(Base):
+    # Token part of a login nonce, `<issued at>.<salt>.<hmac>`
+    token = Column(VARCHAR(64), primary_key=True)
+    expires_at = Column(TIMESTAMP, nullable=False)
+
+    __table_args__ = (
+        # Serves the purge of expired nonces
+        Index("ix_usednonces_expires_at", "expires_at"),
+    )
@@ -1,39 +1,59 @@
+import enum
+from typing import List, Type
+
 from sqlalchemy import (
     BOOLEAN,
     TIMESTAMP,
     VARCHAR,
     Column,
+    Enum,
     ForeignKey,
+    Index,
     Integer,
     false,
     text,
 )
-from sqlalchemy_utils import ChoiceType
 from sqlalchemy_utils.types import UUIDType
 
 from app.db.base_class import Base
 
 
-class Projects(Base):
-    MODES = [
-        ("full", "full"),
-        ("archived", "archived")
-    ]
-    NETWORKS = [
-        ("mainnet", "mainnet"),
-        ("testnet", "testnet")
-    ]
+class ProjectMode(str, enum.Enum):
+    full = "full"
+    archived = "archived"
+
+
+class ProjectNetwork(str, enum.Enum):
+    mainnet = "mainnet"
+    testnet = "testnet"
+
 
+def enum_values(enum_class: Type[enum.Enum]) -> List[str]:
+    return [member.value for member in enum_class]
+
+
+class Projects(Base):
     id = Column(Integer, primary_key=True, index=True)
-    node_id = Column(UUIDType(binary=False), index=True, nullable=False, server_default=text("gen_random_uuid()"))
+    node_id = Column(UUIDType(binary=False), index=True, unique=True, nullable=False,
+                     server_default=text("gen_random_uuid()"))
     user_id = Column(Integer, ForeignKey("user.id"))
     cryptocurrency_symbol = Column(VARCHAR(12), ForeignKey("cryptocurrencies.symbol"))
 
     status = Column(VARCHAR(9), nullable=False, server_default="pending")
-    mode = Column(ChoiceType(MODES, impl=VARCHAR(8)), nullable=False)
-    network = Column(ChoiceType(NETWORKS, impl=VARCHAR(7)), nullable=False)
+    # Last status change made by the provisioning tasks, tells a lost deployment from one waiting for its retry
+    status_changed_on = Column(TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+    mode = Column(Enum(ProjectMode, name="project_mode", values_callable=enum_values), nullable=False)
+    network = Column(Enum(ProjectNetwork, name="project_network", values_callable=enum_values), nullable=False)
     is_paid = Column(BOOLEAN, nullable=False, server_default=false())
     paid_until = Column(TIMESTAMP, nullable=True)
     created_on = Column(TIMESTAMP, server_default=text("CURRENT_TIMESTAMP"))
-    api_key = Column(UUIDType(binary=False), nullable=False, server_default=text("gen_random_uuid()"))
+    api_key = Column(UUIDType(binary=False), index=True, unique=True, nullable=False,
+                     server_default=text("gen_random_uuid()"))
     prefix = Column(VARCHAR(8), nullable=False)
+
+    __table_args__ = (
+        # Serves owner lookups and answers owner api key lookups from the index alone
+        Index("ix_projects_user_id_api_key", "user_id", "api_key"),
+        # Expiry scans of active and paid projects
+        Index("ix_projects_status_paid_until", "status", "paid_until"),
+    )
@@ -0,0 +1,21 @@
+from sqlalchemy import TIMESTAMP, VARCHAR, BigInteger, Column, Index, Integer
+from sqlalchemy_utils.types import UUIDType
+
+from app.db.base_class import Base
+
+
+class UsageRollups(Base):
+    GRANULARITIES = ("hour", "day")
+
+    id = Column(Integer, primary_key=True)
+    api_key = Column(UUIDType(binary=False), nullable=False)
+    granularity = Column(VARCHAR(4), nullable=False)
+    bucket_start = Column(TIMESTAMP, nullable=False)
+    requests = Column(BigInteger, nullable=False, server_default="0")
+
+    __table_args__ = (
+        # Serves the per-key range scans and the upsert conflict target
+        Index("ix_usagerollups_api_key_bucket_start", "api_key", "bucket_start", "granularity", unique=True),
+        # Serves the daily rollup of all keys and the lookup of the first rolled up hour
+        Index("ix_usagerollups_granularity_bucket_start", "granularity", "bucket_start"),
+    )
@@ -1,61 +1,234 @@
-from math import ceil
-from typing import List, Literal
+import asyncio
+from typing import Any, Callable, Dict, List, Literal, Optional, Sequence
 
-import requests
-from requests.auth import HTTPBasicAuth
+import httpx
 
+from app import promql
+from app.core import metrics
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.resampling import resample
+from app.utils import literal_to_seconds
 
+_client: Optional[httpx.AsyncClient] = None
+_sync_client: Optional[httpx.Client] = None
 
-def generate_time_slice(timerange: Literal["1h", "1d", "7d", "30d"]):
+analytics_cache = TTLCache(maxsize=settings.ANALYTICS_CACHE_SIZE)
+metrics.register("analytics_cache", analytics_cache.stats)
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def query_resolution(timerange: Literal["1h", "1d", "7d", "30d"]) -> str:
+    """
+    Fine enough to give every one of up to 99 chart steps its own points.
+    """
     if timerange == "1h":
-        return "[1h:10m]"
+        return "30s"
     elif timerange == "1d":
-        return "[1d:3h]"
+        return "10m"
     elif timerange == "7d":
-        return "[7d:1d]"
-    elif timerange == "30d":
-        return "[30d:5d]"
-
-
-def get_analytics(api_key: str, timerange: Literal["1h", "1d", "7d", "30d"]) -> List:
-    response = requests.get(settings.PROMETHEUS_URL + '/api/v1/query',
-                            params={
-                                "query": 'delta(%s{api_key="%s",envoy_cluster_name=~"user_.*_http"}[1m])%s' %
-                                         (settings.PROMETHEUS_METRIC, api_key, generate_time_slice(timerange))},
-                            auth=HTTPBasicAuth(settings.PROMETHEUS_USER, settings.PROMETHEUS_PASSWORD))
-    result = response.json()["data"]["result"]
-    if result:
-        return [
-            {
-                "timestamp": item[0],
-                "value": ceil(float(item[1]))
-            } for item in response.json()["data"]["result"][0]["values"]
-        ]
-    return []
-
-
-def get_analytics_total(api_key_list: List[str], timerange: Literal["1h", "1d", "7d", "30d"]):
-    response = requests.get(settings.PROMETHEUS_URL + '/api/v1/query',
-                            params={
-                                "query": 'delta(%s{api_key=~"%s",envoy_cluster_name=~"user_.*_http"}[1m])%s' %
-                                         (settings.PROMETHEUS_METRIC, "|".join(api_key_list), generate_time_slice(timerange))},
-                            auth=HTTPBasicAuth(settings.PROMETHEUS_USER, settings.PROMETHEUS_PASSWORD))
-    result = response.json()["data"]["result"]
-    single_response = {}
-    for metric in result:
-        for timestamp, value in metric["values"]:
-            if timestamp not in single_response:
-                single_response[timestamp] = ceil(float(value))
-            else:
-                single_response[timestamp] += ceil(float(value))
-    if single_response:
-        return [{
-            "timestamp": timestamp,
-            "value": value
-        } for timestamp, value in single_response.items()]
-    return []
-
-
-if __name__ == '__main__':
-    print(get_analytics_total(["cte7aju2-z8f96p4b-ag0039p6-lea465v92", "cte7aju2-z8f96p4b-ag0039p6-lea465v92"], "1h"))
+        return "1h"
+    else:
+        return "6h"
+
+
+def generate_time_slice(timerange: Literal["1h", "1d", "7d", "30d"]) -> str:
+    return "[%s:%s]" % (timerange, query_resolution(timerange))
+
+
+def slice_resolution(timerange: Literal["1h", "1d", "7d", "30d"]) -> int:
+    """
+    Resolution of the subquery in seconds, a chart can't change faster than that.
+    """
+    resolution = query_resolution(timerange)
+    return int(resolution[:-1]) * DURATION_UNITS[resolution[-1]]
+
+
+def requests_query(matcher: str, timerange: Literal["1h", "1d", "7d", "30d"],
+                   aggregation: Optional[str] = None, by: Optional[Sequence[str]] = None) -> str:
+    """
+    Requests per resolution window, the windows tile the range so the points add up to the total.
+
+    With `aggregation` the series are merged by Prometheus, optionally keeping the `by` labels apart.
+    """
+    resolution = query_resolution(timerange)
+    expr = promql.range_function(
+        "delta", promql.selector(settings.PROMETHEUS_METRIC, matcher, 'envoy_cluster_name=~"user_.*_http"'), resolution
+    )
+    if aggregation:
+        expr = promql.aggregate(aggregation, expr, by)
+    return promql.subquery(expr, timerange, resolution)
+
+
+def window_query(matcher: Optional[str], window: int, offset: int = 0, by: Optional[Sequence[str]] = None) -> str:
+    """
+    Requests in the `window` seconds ending `offset` seconds ago, summed over the matching series.
+    """
+    expr = promql.range_function(
+        "delta", promql.selector(settings.PROMETHEUS_METRIC, matcher, 'envoy_cluster_name=~"user_.*_http"'),
+        "%ds" % window, "%ds" % offset if offset else None
+    )
+    return promql.aggregate("sum", expr, by)
+
+
+def client_options() -> Dict:
+    return {
+        "base_url": settings.PROMETHEUS_URL,
+        "auth": (settings.PROMETHEUS_USER, settings.PROMETHEUS_PASSWORD),
+        "timeout": httpx.Timeout(settings.PROMETHEUS_READ_TIMEOUT, connect=settings.PROMETHEUS_CONNECT_TIMEOUT),
+        "limits": httpx.Limits(max_connections=settings.PROMETHEUS_MAX_CONNECTIONS,
+                               max_keepalive_connections=settings.PROMETHEUS_MAX_KEEPALIVE_CONNECTIONS)
+    }
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Shared Prometheus client, keeps connections alive between requests.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(**client_options())
+    return _client
+
+
+def get_sync_client() -> httpx.Client:
+    """
+    Blocking counterpart of get_client for Celery tasks, created lazily so every worker process has its own.
+    """
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(**client_options())
+    return _sync_client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def query(expression: str) -> List[Dict]:
+    if len(expression) > settings.PROMETHEUS_POST_THRESHOLD:
+        # Long regex matchers would run into URL length limits
+        response = await get_client().post("/api/v1/query", data={"query": expression})
+    else:
+        response = await get_client().get("/api/v1/query", params={"query": expression})
+    response.raise_for_status()
+    return response.json()["data"]["result"]
+
+
+async def query_range(expression: str, start: float, end: float, step: int) -> List[Dict]:
+    params: Dict[str, Any] = {"query": expression, "start": start, "end": end, "step": step}
+    if len(expression) > settings.PROMETHEUS_POST_THRESHOLD:
+        response = await get_client().post("/api/v1/query_range", data=params)
+    else:
+        response = await get_client().get("/api/v1/query_range", params=params)
+    response.raise_for_status()
+    return response.json()["data"]["result"]
+
+
+def query_sync(expression: str, time: Optional[float] = None) -> List[Dict]:
+    """
+    Blocking variant for Celery tasks, which don't run an event loop.
+    """
+    params: Dict[str, Any] = {"query": expression}
+    if time is not None:
+        params["time"] = time
+    response = get_sync_client().post("/api/v1/query", data=params)
+    response.raise_for_status()
+    return response.json()["data"]["result"]
+
+
+def query_range_sync(expression: str, start: float, end: float, step: int) -> List[Dict]:
+    params = {"query": expression, "start": start, "end": end, "step": step}
+    response = get_sync_client().post("/api/v1/query_range", data=params)
+    response.raise_for_status()
+    return response.json()["data"]["result"]
+
+
+def chunked(items: Sequence[str], size: int) -> List[Sequence[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def query_chunked(build_query: Callable[[Sequence[str]], str], api_key_list: Sequence[str]) -> List[Dict]:
+    """
+    Split the api keys into bounded chunks, query them concurrently and concatenate the results.
+    """
+    semaphore = asyncio.Semaphore(settings.PROMETHEUS_MAX_PARALLEL_QUERIES)
+
+    async def run(chunk: Sequence[str]) -> List[Dict]:
+        async with semaphore:
+            return await query(build_query(chunk))
+
+    chunks = chunked(api_key_list, settings.PROMETHEUS_KEY_CHUNK_SIZE)
+    results = await asyncio.gather(*(run(chunk) for chunk in chunks))
+    return [metric for result in results for metric in result]
+
+
+async def get_analytics(api_key: str, timerange: Literal["1h", "1d", "7d", "30d"], steps: int) -> List:
+    cache_key = ("node", str(api_key), timerange, steps)
+    cached = analytics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = await query(requests_query(promql.eq("api_key", api_key), timerange))
+    analytics = resample((metric["values"] for metric in result), literal_to_seconds(timerange), steps,
+                         resolution=slice_resolution(timerange))
+    analytics_cache.set(cache_key, analytics, ttl=slice_resolution(timerange))
+    return analytics
+
+
+async def get_analytics_total(api_key_list: List[str], timerange: Literal["1h", "1d", "7d", "30d"],
+                              steps: int) -> List:
+    cache_key = ("total", tuple(sorted(api_key_list)), timerange, steps)
+    cached = analytics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = await query_chunked(
+        lambda chunk: requests_query(promql.regex("api_key", chunk), timerange, "sum"), api_key_list
+    )
+    analytics = resample((metric["values"] for metric in result), literal_to_seconds(timerange), steps,
+                         resolution=slice_resolution(timerange))
+    analytics_cache.set(cache_key, analytics, ttl=slice_resolution(timerange))
+    return analytics
+
+
+async def get_analytics_breakdown(api_key_list: List[str], timerange: Literal["1h", "1d", "7d", "30d"],
+                                  steps: int) -> Dict[str, List]:
+    """
+    Per api key charts, for when the merged series of get_analytics_total is not enough.
+    """
+    cache_key = ("breakdown", tuple(sorted(api_key_list)), timerange, steps)
+    cached = analytics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = await query_chunked(
+        lambda chunk: requests_query(promql.regex("api_key", chunk), timerange, "sum", by=["api_key"]), api_key_list
+    )
+    analytics = {
+        metric["metric"]["api_key"]: resample(
+            [metric["values"]], literal_to_seconds(timerange), steps, resolution=slice_resolution(timerange)
+        )
+        for metric in result
+    }
+    analytics_cache.set(cache_key, analytics, ttl=slice_resolution(timerange))
+    return analytics
+
+
+async def get_top_api_keys(timerange: Literal["1h", "1d", "7d", "30d"], limit: int) -> List[Dict]:
+    """
+    The `limit` busiest api keys of the whole fleet, ranked by Prometheus.
+    """
+    cache_key = ("top", timerange, limit)
+    cached = analytics_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    result = await query(promql.topk(limit, window_query(None, literal_to_seconds(timerange), by=["api_key"])))
+    top = sorted(({
+        "api_key": metric["metric"].get("api_key"),
+        "requests": max(round(float(metric["value"][1])), 0)
+    } for metric in result), key=lambda item: item["requests"], reverse=True)
+    analytics_cache.set(cache_key, top, ttl=slice_resolution(timerange))
+    return top
+
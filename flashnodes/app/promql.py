@@ -0,0 +1,43 @@
+from typing import Iterable, Optional, Sequence
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+def eq(label: str, value: str) -> str:
+    return '%s="%s"' % (label, escape(value))
+
+
+def regex(label: str, values: Iterable[str]) -> str:
+    return '%s=~"%s"' % (label, "|".join(escape(value) for value in values))
+
+
+def selector(metric: str, *matchers: Optional[str]) -> str:
+    return "%s{%s}" % (metric, ",".join(matcher for matcher in matchers if matcher))
+
+
+def range_function(name: str, expr: str, window: str, offset: Optional[str] = None) -> str:
+    """
+    `delta(expr[window])`, `increase(expr[window] offset 1h)` and the like.
+    """
+    if offset:
+        return "%s(%s[%s] offset %s)" % (name, expr, window, offset)
+    return "%s(%s[%s])" % (name, expr, window)
+
+
+def aggregate(operator: str, expr: str, by: Optional[Sequence[str]] = None) -> str:
+    """
+    `sum(expr)` or `sum by (labels) (expr)`, lets Prometheus merge the series before sending them.
+    """
+    if by:
+        return "%s by (%s) (%s)" % (operator, ", ".join(by), expr)
+    return "%s(%s)" % (operator, expr)
+
+
+def subquery(expr: str, timerange: str, resolution: str) -> str:
+    return "(%s)[%s:%s]" % (expr, timerange, resolution)
+
+
+def topk(k: int, expr: str) -> str:
+    return "topk(%d, %s)" % (k, expr)
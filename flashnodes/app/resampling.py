@@ -0,0 +1,69 @@
+import time
+from typing import Dict, Iterable, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils import generate_bucket_timestamps
+
+Aggregation = Literal["sum", "avg", "max", "rate"]
+
+
+def to_arrays(values: Sequence[Sequence]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert Prometheus `[[timestamp, "value"], ...]` pairs into timestamp and value arrays.
+    """
+    if not len(values):
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+    points = np.asarray(values, dtype=np.float64)
+    return points[:, 0], points[:, 1]
+
+
+def resample(
+    series: Iterable[Sequence[Sequence]],
+    seconds: int,
+    steps: int,
+    how: Aggregation = "sum",
+    now: Optional[int] = None,
+    resolution: int = 1
+) -> List[Dict]:
+    """
+    Merge any number of series into wall-clock aligned buckets covering the last `seconds`.
+
+    `resolution` is the spacing of the points, see generate_bucket_timestamps for how it shapes the buckets.
+    All points are concatenated and assigned to their bucket in a single pass, points of the range
+    older than the first bucket are counted in it. `rate` is the bucket sum divided by the bucket width in seconds.
+    """
+    if now is None:
+        now = int(time.time())
+    buckets = generate_bucket_timestamps(seconds, steps, now, resolution)
+    steps = len(buckets)
+    arrays = [to_arrays(values) for values in series]
+    timestamps = np.concatenate([np.empty(0)] + [item[0] for item in arrays])
+    values = np.concatenate([np.empty(0)] + [item[1] for item in arrays])
+
+    index = ((timestamps - buckets.start) // buckets.step).astype(np.int64)
+    # The range rarely starts on a bucket boundary, its leading partial bucket goes into the first one
+    index[(index < 0) & (timestamps >= now - seconds)] = 0
+    in_range = (index >= 0) & (index < steps)
+    index, values = index[in_range], values[in_range]
+
+    counts = np.bincount(index, minlength=steps)
+    sums = np.bincount(index, weights=values, minlength=steps)
+    if how == "sum":
+        result = np.ceil(sums)
+    elif how == "avg":
+        result = np.round(sums / np.maximum(counts, 1), 2)
+    elif how == "max":
+        result = np.full(steps, -np.inf)
+        np.maximum.at(result, index, values)
+        result = np.ceil(np.where(counts > 0, result, 0))
+    elif how == "rate":
+        result = np.round(sums / buckets.step, 2)
+    else:
+        raise ValueError(f"Unknown aggregation: {how}")
+
+    cast = int if how in ("sum", "max") else float
+    return [{
+        "timestamp": timestamp,
+        "value": cast(value)
+    } for timestamp, value in zip(buckets, result.tolist())]
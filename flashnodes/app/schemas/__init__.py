@@ -1,7 +1,15 @@
 from .cryptocurrency import Cryptocurrency, CryptocurrencyDB
 from .msg import Msg
-from .project import Project, ProjectDB, ProjectResponse
+from .project import (
+    Project,
+    ProjectDB,
+    ProjectManageResult,
+    ProjectResponse,
+    ProjectsManage,
+    ProjectsManageResponse
+)
 from .token import Token, TokenPayload
+from .usage import UsageRollup
 from .user import (
     InitAdmin,
     User,
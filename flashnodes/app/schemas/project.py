@@ -1,7 +1,20 @@
-from datetime import datetime, timedelta
-from typing import Literal, Optional
+from datetime import datetime, timedelta, timezone
+from typing import List, Literal, Optional
 
-from pydantic import UUID4, BaseModel, validator
+from pydantic import UUID4, BaseModel, conlist, validator
+
+
+def paid_until_in_future(value: datetime) -> datetime:
+    """
+    Naive UTC `value`, the way timestamps are stored, raises ValueError unless it is in the future.
+
+    Values without a timezone are taken as UTC.
+    """
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    if value <= datetime.now(timezone.utc):
+        raise ValueError("paid_until should be in the future")
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
 
 
 class ProjectBase(BaseModel):
@@ -34,3 +47,26 @@ class ProjectResponse(ProjectBase):
     cryptocurrency_full_name: str
     public_address: Optional[str]
     prefix: str
+
+
+class ProjectsManage(BaseModel):
+    node_ids: conlist(UUID4, min_items=1, max_items=1000)
+    status: Optional[Literal["pending", "deploying", "active", "failed", "expired"]]
+    is_paid: Optional[bool]
+    paid_until: Optional[datetime]
+
+    @validator("paid_until")
+    def paid_until_in_future(cls, value: Optional[datetime]) -> Optional[datetime]:
+        return value if value is None else paid_until_in_future(value)
+
+
+class ProjectManageResult(BaseModel):
+    node_id: UUID4
+    result: Literal["updated", "not_found"]
+    status: Optional[str]
+    is_paid: Optional[bool]
+    paid_until: Optional[datetime]
+
+
+class ProjectsManageResponse(BaseModel):
+    results: List[ProjectManageResult]
@@ -0,0 +1,11 @@
+from datetime import datetime
+from typing import Literal
+
+from pydantic import UUID4, BaseModel
+
+
+class UsageRollup(BaseModel):
+    api_key: UUID4
+    granularity: Literal["hour", "day"]
+    bucket_start: datetime
+    requests: int
@@ -53,6 +53,7 @@ class UserMetamaskNonceResponse(UserMetamaskCreateDB):
 
 
 class UserMetamaskVerify(UserMetamaskCreate):
+    nonce: str
     signed_nonce: str
 
 
@@ -0,0 +1,171 @@
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, Generator, Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+from app import crud
+from app.api import deps
+from app.core.config import settings
+from app.main import app
+from app.schemas import ProjectsManage
+from app.tests.utils.projects import project_row
+from app.tests.utils.prometheus import FakePrometheus
+from app.utils import decode_cursor, encode_cursor
+
+
+@pytest.fixture()
+def superuser_client(monkeypatch: pytest.MonkeyPatch) -> Generator:
+    """
+    Admin endpoints without a database, the crud calls a test needs are patched by the test.
+    """
+    app.dependency_overrides[deps.get_db] = lambda: None
+    app.dependency_overrides[deps.get_current_active_superuser] = lambda: SimpleNamespace(id=1, is_superuser=True)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_top_projects_are_matched_to_their_owners(
+    superuser_client: TestClient, fake_prometheus: FakePrometheus, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fake_prometheus.series = 2
+    fake_prometheus.value = 41.6
+    known, unknown = str(uuid.UUID(int=0)), str(uuid.UUID(int=1))
+    node_id = uuid.uuid4()
+    monkeypatch.setattr(crud.projects, "get_owners_by_api_keys", lambda db, api_keys: [
+        (uuid.UUID(known), node_id, "ETH", "0xabc")
+    ] if set(api_keys) == {known, unknown} else [])
+
+    r = superuser_client.get(f"{settings.API_V1_STR}/admin/analytics/top", params={"timerange": "1d", "limit": 2})
+    assert r.status_code == 200
+    results = {item["api_key"]: item for item in r.json()["results"]}
+    assert results[known] == {
+        "api_key": known, "node_id": str(node_id), "cryptocurrency_symbol": "ETH", "public_address": "0xabc",
+        "requests": 42
+    }
+    assert results[unknown]["node_id"] is None
+    assert fake_prometheus.requests[0]["params"]["query"].startswith("topk(2, sum by (api_key) (")
+
+
+def test_top_projects_limit_is_bounded(superuser_client: TestClient) -> None:
+    r = superuser_client.get(f"{settings.API_V1_STR}/admin/analytics/top", params={"timerange": "1d", "limit": 0})
+    assert r.status_code == 422
+
+
+@pytest.fixture()
+def projects(monkeypatch: pytest.MonkeyPatch) -> list:
+    rows = [project_row(id) for id in range(1, 6)]
+
+    def get_all_internal(
+        db: Any, limit: Optional[int] = None, before_id: Optional[int] = None, offset: Optional[int] = None
+    ) -> list:
+        page = [row for row in reversed(rows) if before_id is None or row.id < before_id][offset:]
+        return page[:limit]
+
+    monkeypatch.setattr(crud.projects, "get_all_internal", get_all_internal)
+    monkeypatch.setattr(crud.projects, "get_total_estimate", lambda db: 4)
+    monkeypatch.setattr(crud.projects, "get_total_cached", lambda db: len(rows))
+    return rows
+
+
+def test_cursor_round_trip() -> None:
+    assert decode_cursor(encode_cursor(12345)) == 12345
+    assert decode_cursor("not a cursor") is None
+    assert decode_cursor(encode_cursor(0)) is None
+
+
+def test_projects_are_paged_by_cursor(superuser_client: TestClient, projects: list) -> None:
+    pages = []
+    params = {"limit": 2}
+    while True:
+        r = superuser_client.get(f"{settings.API_V1_STR}/admin/projects", params=params)
+        assert r.status_code == 200
+        body = r.json()
+        pages.append([project["node_id"] for project in body["results"]])
+        assert body["total"] == 5
+        if body["next_cursor"] is None:
+            break
+        params["cursor"] = body["next_cursor"]
+    node_ids = {project.id: str(project.node_id) for project in projects}
+    assert pages == [[node_ids[5], node_ids[4]], [node_ids[3], node_ids[2]], [node_ids[1]]]
+
+
+def test_projects_total_is_estimated_or_counted(superuser_client: TestClient, projects: list) -> None:
+    url = f"{settings.API_V1_STR}/admin/projects"
+    assert superuser_client.get(url, params={"total": "estimate"}).json()["total"] == 4
+    assert superuser_client.get(url, params={"total": "exact"}).json()["total"] == 5
+    assert superuser_client.get(url, params={"total": "all"}).status_code == 422
+    assert superuser_client.get(url, params={"cursor": "!"}).status_code == 422
+
+
+def test_projects_can_still_be_paged_by_offset(superuser_client: TestClient, projects: list) -> None:
+    url = f"{settings.API_V1_STR}/admin/projects"
+    body = superuser_client.get(url, params={"limit": 2, "offset": 2}).json()
+    node_ids = {project.id: str(project.node_id) for project in projects}
+    assert [project["node_id"] for project in body["results"]] == [node_ids[3], node_ids[2]]
+    assert body["total"] == 5
+    assert superuser_client.get(url, params={"offset": -1}).status_code == 422
+    cursor = encode_cursor(4)
+    assert superuser_client.get(url, params={"offset": 1, "cursor": cursor}).status_code == 422
+
+
+def test_bulk_manage_reports_updated_and_missing_projects(
+    superuser_client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    Row = namedtuple("Row", ["node_id", "status", "is_paid", "paid_until"])
+    found, missing = uuid.uuid4(), uuid.uuid4()
+    paid_until = datetime.utcnow().replace(microsecond=0) + timedelta(days=30)
+    calls = []
+
+    def manage_many_internal(db: Any, node_ids: list, values: dict) -> list:
+        calls.append((node_ids, values))
+        return [Row(found, "active", True, values["paid_until"])]
+
+    monkeypatch.setattr(crud.projects, "manage_many_internal", manage_many_internal)
+    r = superuser_client.post(f"{settings.API_V1_STR}/admin/projects/manage", json={
+        "node_ids": [str(found), str(missing), str(found)],
+        "is_paid": True,
+        "paid_until": paid_until.isoformat()
+    })
+    assert r.status_code == 200
+    assert r.json()["results"] == [
+        {"node_id": str(found), "result": "updated", "status": "active", "is_paid": True,
+         "paid_until": paid_until.isoformat()},
+        {"node_id": str(missing), "result": "not_found", "status": None, "is_paid": None, "paid_until": None}
+    ]
+    assert calls == [([found, missing], {"is_paid": True, "paid_until": paid_until})]
+
+
+def test_bulk_manage_rejects_past_paid_until(superuser_client: TestClient) -> None:
+    r = superuser_client.post(f"{settings.API_V1_STR}/admin/projects/manage", json={
+        "node_ids": [str(uuid.uuid4())],
+        "paid_until": (datetime.utcnow() - timedelta(days=1)).isoformat()
+    })
+    assert r.status_code == 422
+
+
+def test_paid_until_with_an_offset_is_stored_as_naive_utc() -> None:
+    in_a_day = datetime.now(timezone(timedelta(hours=2))).replace(microsecond=0) + timedelta(days=1)
+    body = ProjectsManage(node_ids=[uuid.uuid4()], paid_until=in_a_day.isoformat())
+    assert body.paid_until == in_a_day.astimezone(timezone.utc).replace(tzinfo=None)
+    with pytest.raises(ValidationError):
+        ProjectsManage(node_ids=[uuid.uuid4()], paid_until=(in_a_day - timedelta(days=2)).isoformat())
+
+
+def test_manage_project_rejects_past_reserve_until(
+    superuser_client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(crud.projects, "get_by_node_id_internal", lambda db, node_id: (project_row(1), "0xabc"))
+    updates = []
+    monkeypatch.setattr(crud.projects, "manage_by_node_id_internal", lambda *args: updates.append(args))
+    url = f"{settings.API_V1_STR}/admin/projects/manage/{uuid.uuid4()}"
+    yesterday = datetime.now(timezone.utc) - timedelta(days=1)
+    r = superuser_client.post(url, params={"reserve_until": yesterday.isoformat()})
+    assert r.status_code == 422
+    assert r.json()["detail"] == "paid_until should be in the future"
+    assert superuser_client.post(url, params={"reserve_until": "tomorrow"}).status_code == 422
+    assert updates == []
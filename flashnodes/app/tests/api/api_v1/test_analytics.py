@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+import uuid
+from types import SimpleNamespace
+from typing import Any, Dict, Generator
+
+import pytest
+from fastapi.testclient import TestClient
+from requests import Response
+
+from app import crud
+from app.api import deps
+from app.core.config import settings
+from app.main import app
+from app.tests.utils.prometheus import FakePrometheus
+
+API_KEY = str(uuid.UUID(int=0))
+NODE_ID = str(uuid.uuid4())
+
+
+@pytest.fixture()
+def export_client(fake_prometheus: FakePrometheus, monkeypatch: pytest.MonkeyPatch) -> Generator:
+    """
+    A user owning one project whose api key is the one FakePrometheus answers for, without a database.
+    """
+    async def get_node_ids_by_api_key(db: Any, user_id: int) -> Dict[str, str]:
+        return {API_KEY: NODE_ID}
+
+    monkeypatch.setattr(crud.projects, "get_node_ids_by_api_key_async", get_node_ids_by_api_key)
+    app.dependency_overrides[deps.get_async_db] = lambda: None
+    app.dependency_overrides[deps.get_current_user_async] = lambda: SimpleNamespace(id=1, is_active=True)
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def export(client: TestClient, **params: str) -> Response:
+    params = {"start": "2026-01-01T00:00:00", "end": "2026-01-01T03:00:00", **params}
+    return client.get(f"{settings.API_V1_STR}/analytics/export", params=params)
+
+
+def test_export_ndjson(export_client: TestClient, fake_prometheus: FakePrometheus) -> None:
+    r = export(export_client)
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert rows[0] == {"api_key": API_KEY, "timestamp": 1767225600, "requests": 1, "node_id": NODE_ID}
+    assert [row["timestamp"] for row in rows] == [1767225600 + hour * 3600 for hour in range(4)]
+
+
+def test_export_csv(export_client: TestClient) -> None:
+    r = export(export_client, format="csv")
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert len(rows) == 4
+    assert rows[0] == {"node_id": NODE_ID, "api_key": API_KEY, "timestamp": "1767225600", "requests": "1"}
+
+
+def test_export_honours_utc_offsets(export_client: TestClient) -> None:
+    r = export(export_client, start="2026-01-01T01:00:00+01:00", end="2026-01-01T01:00:00+01:00")
+    assert r.status_code == 422
+    r = export(export_client, start="2026-01-01T01:00:00+01:00", end="2026-01-01T01:00:00")
+    assert [json.loads(line)["timestamp"] for line in r.text.splitlines()] == [1767225600, 1767229200]
+
+
+def test_export_range_is_limited(export_client: TestClient) -> None:
+    r = export(export_client, end="2026-03-01T00:00:00")
+    assert r.status_code == 422
+    assert str(settings.USAGE_EXPORT_MAX_DAYS) in r.json()["detail"]
@@ -1,7 +1,9 @@
 from typing import Dict
 
+import pytest
 from fastapi.testclient import TestClient
 
+from app.core import signatures
 from app.core.config import settings
 from app.tests.utils.login import sign_message, spawn_account
 
@@ -9,14 +11,15 @@ from app.tests.utils.login import sign_message, spawn_account
 def test_get_access_token(client: TestClient) -> None:
     account = spawn_account()
     public_address = account.address
-    r = client.post(f"{settings.API_V1_STR}/login/metamask/nonce/{public_address}")
+    r = client.get(f"{settings.API_V1_STR}/login/metamask/nonce/{public_address}")
     assert r.status_code == 200
     nonce_response = r.json()
     nonce = nonce_response["nonce"]
 
     r = client.post(f"{settings.API_V1_STR}/login/auth",
-                    data={
+                    json={
                         "public_address": public_address,
+                        "nonce": nonce,
                         "signed_nonce": sign_message(account, nonce)
                     })
     result = r.json()
@@ -24,6 +27,19 @@ def test_get_access_token(client: TestClient) -> None:
     assert "access_token" in result
 
 
+def test_nonce_can_not_be_replayed(client: TestClient) -> None:
+    account = spawn_account()
+    public_address = account.address
+    nonce = client.get(f"{settings.API_V1_STR}/login/metamask/nonce/{public_address}").json()["nonce"]
+    body = {
+        "public_address": public_address,
+        "nonce": nonce,
+        "signed_nonce": sign_message(account, nonce)
+    }
+    assert client.post(f"{settings.API_V1_STR}/login/auth", json=body).status_code == 200
+    assert client.post(f"{settings.API_V1_STR}/login/auth", json=body).status_code == 403
+
+
 def test_use_access_token(
     client: TestClient, superuser_token_headers: Dict[str, str]
 ) -> None:
@@ -33,3 +49,20 @@ def test_use_access_token(
     result = r.json()
     assert r.status_code == 200
     assert "email" in result
+
+
+def test_login_turned_away_while_overloaded_can_be_retried(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    account = spawn_account()
+    public_address = account.address
+    nonce = client.get(f"{settings.API_V1_STR}/login/metamask/nonce/{public_address}").json()["nonce"]
+    body = {
+        "public_address": public_address,
+        "nonce": nonce,
+        "signed_nonce": sign_message(account, nonce)
+    }
+    monkeypatch.setattr(signatures, "_pending", settings.SIGNATURE_QUEUE_LIMIT)
+    assert client.post(f"{settings.API_V1_STR}/login/auth", json=body).status_code == 503
+    monkeypatch.setattr(signatures, "_pending", 0)
+    assert client.post(f"{settings.API_V1_STR}/login/auth", json=body).status_code == 200
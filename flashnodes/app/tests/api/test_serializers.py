@@ -0,0 +1,40 @@
+import uuid
+
+import orjson
+
+from app.api.responses import ORJSONResponse
+from app.api.serializers import serialize_project
+from app.tests.utils.projects import project_row
+
+
+def test_serialize_project_row() -> None:
+    row = project_row(1)
+    body = serialize_project(row)
+    assert body["mode"] == "full"
+    assert body["network"] == "mainnet"
+    assert body["paid_until"] == "2030-01-01 00:00:00"
+    assert body["cryptocurrency_full_name"] == "Ethereum"
+    assert body["public_address"] == "0xabc"
+
+
+def test_serialize_project_without_paid_until() -> None:
+    # Unpaid projects report null rather than the string "None"
+    assert serialize_project(project_row(1, paid_until=None))["paid_until"] is None
+
+
+def test_serialize_project_entity_takes_joined_values() -> None:
+    entity = project_row(1, cryptocurrency_full_name=None)
+    del entity.public_address
+    body = serialize_project(entity, cryptocurrency_full_name="Bitcoin", public_address="0xdef")
+    assert body["cryptocurrency_full_name"] == "Bitcoin"
+    assert body["public_address"] == "0xdef"
+
+
+def test_orjson_response_renders_uuids() -> None:
+    row = project_row(1, paid_until=None)
+    response = ORJSONResponse({"results": [serialize_project(row)]})
+    assert response.media_type == "application/json"
+    result = orjson.loads(response.body)["results"][0]
+    assert result["node_id"] == str(row.node_id)
+    assert uuid.UUID(result["api_key"]) == row.api_key
+    assert result["paid_until"] is None
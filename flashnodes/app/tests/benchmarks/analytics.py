@@ -0,0 +1,161 @@
+"""
+Analytics latency benchmark against a local Prometheus stand-in.
+
+    python -m app.tests.benchmarks.analytics --series 100 --points 120 --latency 0.05
+
+No database is needed: the api key lookups and the current user are replaced in-process.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import httpx
+
+from app import crud, prometheus
+from app.api import deps
+from app.core.config import settings
+from app.main import app
+from app.tests.utils.prometheus import FakePrometheus
+
+CONCURRENCY = (1, 10, 50, 100)
+API_KEY_COUNTS = (1, 100, 5000)
+
+
+def percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * percent / 100), len(ordered) - 1)]
+
+
+def report(name: str, samples: List[float], peak_memory: int) -> None:
+    print(f"{name:<40} n={len(samples):<5} "
+          f"p50={percentile(samples, 50) * 1000:8.1f}ms "
+          f"p95={percentile(samples, 95) * 1000:8.1f}ms "
+          f"p99={percentile(samples, 99) * 1000:8.1f}ms "
+          f"mean={statistics.mean(samples) * 1000:8.1f}ms "
+          f"peak={peak_memory / 1024:8.0f}KiB")
+
+
+async def run_concurrently(call: Callable, concurrency: int, requests: int, cached: bool) -> List[float]:
+    samples: List[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run() -> None:
+        async with semaphore:
+            if not cached:
+                prometheus.analytics_cache.clear()
+            started = time.perf_counter()
+            await call()
+            samples.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(run() for _ in range(requests)))
+    return samples
+
+
+async def measure(name: str, call: Callable, concurrency: int, requests: int, cached: bool) -> None:
+    """
+    Latencies come from a pass of their own, tracemalloc slows down every allocation of the memory pass.
+    """
+    samples = await run_concurrently(call, concurrency, requests, cached)
+    tracemalloc.start()
+    try:
+        await run_concurrently(call, concurrency, requests, cached)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    report(name, samples, peak)
+
+
+@contextmanager
+def overridden_dependencies(api_keys: List[str]) -> Iterator[Dict[str, str]]:
+    """
+    Replace the database lookups of the analytics endpoints, everything is restored on exit.
+    """
+    user = SimpleNamespace(id=1, public_address="0x0", is_active=True, is_superuser=False)
+    node_ids = {api_key: str(uuid.uuid4()) for api_key in api_keys}
+
+    async def get_all_api_keys(db: Any, user_id: int) -> List[str]:
+        return list(api_keys)
+
+    async def get_api_key_by_node_id(db: Any, user_id: int, node_id: str) -> SimpleNamespace:
+        return SimpleNamespace(api_key=api_keys[0])
+
+    overrides: Dict[Callable, Callable] = {deps.get_async_db: lambda: None, deps.get_current_user_async: lambda: user}
+    crud_methods: Dict[str, Callable] = {
+        "get_all_api_keys_async": get_all_api_keys,
+        "get_api_key_by_node_id_async": get_api_key_by_node_id
+    }
+    saved_overrides = dict(app.dependency_overrides)
+    saved_methods: Dict[str, Optional[Callable]] = {name: crud.projects.__dict__.get(name) for name in crud_methods}
+    app.dependency_overrides.update(overrides)
+    for name, method in crud_methods.items():
+        setattr(crud.projects, name, method)
+    try:
+        yield node_ids
+    finally:
+        app.dependency_overrides.clear()
+        app.dependency_overrides.update(saved_overrides)
+        for name, saved in saved_methods.items():
+            if saved is None:
+                delattr(crud.projects, name)
+            else:
+                setattr(crud.projects, name, saved)
+
+
+async def bench_endpoints(args: argparse.Namespace) -> None:
+    api_keys = [str(uuid.uuid4()) for _ in range(args.keys)]
+    transport = httpx.ASGITransport(app=app)
+    with overridden_dependencies(api_keys) as node_ids:
+        node_id = next(iter(node_ids.values()))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for concurrency in CONCURRENCY:
+                async def total() -> None:
+                    response = await client.get(f"{settings.API_V1_STR}/analytics/total", params={"timerange": "1h"})
+                    response.raise_for_status()
+
+                async def node() -> None:
+                    response = await client.get(
+                        f"{settings.API_V1_STR}/analytics/{node_id}", params={"timerange": "1h"}
+                    )
+                    response.raise_for_status()
+
+                await measure(f"/analytics/total c={concurrency}", total, concurrency, args.requests, args.cached)
+                await measure(f"/analytics/{{node_id}} c={concurrency}", node, concurrency, args.requests, args.cached)
+
+
+async def bench_total(args: argparse.Namespace) -> None:
+    for count in API_KEY_COUNTS:
+        api_keys = [str(uuid.uuid4()) for _ in range(count)]
+        await measure(
+            f"get_analytics_total keys={count}",
+            lambda: prometheus.get_analytics_total(api_keys, "1h", 6),
+            1, max(args.requests // 10, 1), args.cached
+        )
+
+
+async def main(args: argparse.Namespace) -> None:
+    prometheus_url = settings.PROMETHEUS_URL
+    with FakePrometheus(series=args.series, points=args.points, latency=args.latency) as fake:
+        settings.PROMETHEUS_URL = fake.url
+        try:
+            await bench_endpoints(args)
+            await bench_total(args)
+        finally:
+            await prometheus.close_client()
+            settings.PROMETHEUS_URL = prometheus_url
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--series", type=int, default=10, help="series per Prometheus result")
+    parser.add_argument("--points", type=int, default=120, help="points per series")
+    parser.add_argument("--latency", type=float, default=0.0, help="Prometheus latency in seconds")
+    parser.add_argument("--keys", type=int, default=10, help="api keys of the benchmark user")
+    parser.add_argument("--requests", type=int, default=200, help="requests per concurrency level")
+    parser.add_argument("--cached", action="store_true", help="keep the analytics cache between requests")
+    asyncio.run(main(parser.parse_args()))
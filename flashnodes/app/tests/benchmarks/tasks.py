@@ -0,0 +1,92 @@
+"""
+Celery throughput benchmark on the in-memory broker.
+
+    python -m app.tests.benchmarks.tasks --messages 2000 --work 0.001
+
+Measures tasks per second for every combination of concurrency, prefetch multiplier and
+batch size. Concurrency is modelled as that many solo pool consumers, the way prefork
+children each run one task at a time. No broker or database is needed.
+"""
+import argparse
+import itertools
+import threading
+import time
+from contextlib import ExitStack
+
+from celery import Celery
+from celery.contrib.testing.worker import start_worker
+
+from app.core.batching import batched_task
+
+CONCURRENCY = (1, 4, 8)
+PREFETCH_MULTIPLIERS = (1, 4, 16)
+BATCH_SIZES = (1, 10, 100)
+
+bench_app = Celery("bench", broker="memory://", backend="cache+memory://")
+bench_app.conf.task_ignore_result = True
+# The memory transport polls, the default of one second would dominate every measurement
+bench_app.conf.broker_transport_options = {"polling_interval": 0.001}
+
+done = 0
+done_lock = threading.Lock()
+work_seconds = 0.0
+
+
+def work(item: int) -> None:
+    global done
+    if work_seconds:
+        time.sleep(work_seconds)
+    with done_lock:
+        done += 1
+
+
+@bench_app.task(name="bench.single")
+def single(item: int) -> None:
+    work(item)
+
+
+batch_tasks = {size: batched_task(bench_app, size, name=f"bench.batch_{size}")(work) for size in BATCH_SIZES}
+
+
+def wait_for(messages: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while done < messages:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{done} of {messages} tasks done after {timeout}s")
+        time.sleep(0.001)
+
+
+def measure(concurrency: int, prefetch_multiplier: int, batch_size: int, messages: int, timeout: float) -> None:
+    global done
+    bench_app.control.purge()
+    done = 0
+    with ExitStack() as workers:
+        for _ in range(concurrency):
+            workers.enter_context(start_worker(bench_app, pool="solo", perform_ping_check=False,
+                                               prefetch_multiplier=prefetch_multiplier, shutdown_timeout=timeout))
+        started = time.perf_counter()
+        if batch_size == 1:
+            for item in range(messages):
+                single.delay(item)
+        else:
+            batch_tasks[batch_size].delay_many((item,) for item in range(messages))
+        wait_for(messages, timeout)
+        elapsed = time.perf_counter() - started
+    print(f"concurrency={concurrency:<3} prefetch={prefetch_multiplier:<3} batch={batch_size:<4} "
+          f"tasks={messages:<6} {messages / elapsed:10.0f} tasks/s")
+
+
+def main(args: argparse.Namespace) -> None:
+    global work_seconds
+    work_seconds = args.work
+    for concurrency, prefetch_multiplier, batch_size in itertools.product(
+            CONCURRENCY, PREFETCH_MULTIPLIERS, BATCH_SIZES):
+        measure(concurrency, prefetch_multiplier, batch_size, args.messages, args.timeout)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000, help="tasks per configuration")
+    parser.add_argument("--work", type=float, default=0.0, help="seconds every task sleeps")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait per configuration")
+    main(parser.parse_args())
@@ -4,9 +4,11 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 
+from app import prometheus
 from app.core.config import settings
 from app.db.session import SessionLocal
 from app.main import app
+from app.tests.utils.prometheus import FakePrometheus
 from app.tests.utils.user import authentication_token_from_email
 from app.tests.utils.utils import get_superuser_token_headers
 
@@ -32,3 +34,13 @@ def normal_user_token_headers(client: TestClient, db: Session) -> Dict[str, str]
     return authentication_token_from_email(
         client=client, email=settings.EMAIL_TEST_USER, db=db
     )
+
+
+@pytest.fixture()
+def fake_prometheus(monkeypatch: pytest.MonkeyPatch) -> Generator:
+    with FakePrometheus() as fake:
+        monkeypatch.setattr(settings, "PROMETHEUS_URL", fake.url)
+        monkeypatch.setattr(prometheus, "_client", None)
+        monkeypatch.setattr(prometheus, "_sync_client", None)
+        prometheus.analytics_cache.clear()
+        yield fake
@@ -0,0 +1,34 @@
+from celery import Celery
+
+from app.core.batching import batched_task
+
+
+def test_batched_task_groups_items() -> None:
+    app = Celery("test", broker="memory://")
+    app.conf.task_always_eager = True
+    seen = []
+
+    @batched_task(app, batch_size=3)
+    def record(a: int, b: int) -> None:
+        seen.append((a, b))
+
+    assert record.delay_many([(i, i * 2) for i in range(7)]) == 3
+    assert seen == [(i, i * 2) for i in range(7)]
+
+
+def test_batched_task_options_are_not_shared_state() -> None:
+    app = Celery("test", broker="memory://")
+    decorator = batched_task(app, batch_size=3, name="tests.record")
+
+    def record(a: int) -> None:
+        pass
+
+    def other(a: int) -> None:
+        pass
+
+    assert decorator(record).name == "tests.record"
+    # Asks for the same name again, instead of silently falling back to a derived one
+    assert decorator(other).name == "tests.record"
+    defaults = batched_task(app, batch_size=3)
+    assert defaults(record).name.endswith(".record")
+    assert defaults(other).name.endswith(".other")
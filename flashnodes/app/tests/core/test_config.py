@@ -0,0 +1,27 @@
+import pytest
+
+from app.core.celery_app import worker_options
+from app.core.config import Settings, settings
+
+
+def test_celery_queue_overrides_keep_the_defaults(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CELERY_QUEUES", '{"provisioning": {"concurrency": 8}, "bulk": {"concurrency": 2}}')
+    queues = Settings().CELERY_QUEUES
+    assert queues["provisioning"].concurrency == 8
+    assert queues["provisioning"].soft_time_limit == 1800
+    assert queues["main-queue"].prefetch_multiplier == 4
+    assert queues["bulk"].concurrency == 2
+    assert queues["bulk"].acks_late
+
+
+def test_tasks_must_be_routed_to_configured_queues(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CELERY_TASK_QUEUES", '{"app.worker.test_celery": "missing"}')
+    with pytest.raises(ValueError, match="unconfigured queues: missing"):
+        Settings()
+
+
+def test_worker_options_use_the_settings_of_their_queue(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CELERY_QUEUES", '{"provisioning": {"concurrency": 8}}')
+    monkeypatch.setattr(settings, "CELERY_QUEUES", Settings().CELERY_QUEUES)
+    assert worker_options("provisioning") == "-Q provisioning -n provisioning@%h -c 8 --prefetch-multiplier 1"
+    assert worker_options("main-queue") == "-Q main-queue -n main-queue@%h -c 1 --prefetch-multiplier 4"
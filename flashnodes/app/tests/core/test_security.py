@@ -0,0 +1,16 @@
+from app.core import security
+
+PUBLIC_ADDRESS = "0x" + "ab" * 20
+
+
+def test_login_nonce_token_is_the_signed_part() -> None:
+    nonce = security.generate_login_nonce(PUBLIC_ADDRESS)
+    token = security.login_nonce_token(PUBLIC_ADDRESS, nonce)
+    assert token is not None and nonce.endswith(token)
+
+
+def test_login_nonce_is_bound_to_the_address() -> None:
+    nonce = security.generate_login_nonce(PUBLIC_ADDRESS)
+    other = "0x" + "cd" * 20
+    assert security.login_nonce_token(other, nonce) is None
+    assert security.login_nonce_token(PUBLIC_ADDRESS, nonce[:-1]) is None
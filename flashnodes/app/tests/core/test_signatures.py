@@ -0,0 +1,50 @@
+import asyncio
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Generator
+
+import pytest
+
+from app.core import signatures
+from app.core.config import settings
+from app.tests.utils.login import sign_message, spawn_account
+
+
+class BrokenExecutor:
+    def __init__(self) -> None:
+        self.shut_down = False
+
+    def submit(self, *args: Any) -> None:
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.shut_down = True
+
+
+@pytest.fixture()
+def executor() -> Generator:
+    yield
+    signatures.shutdown_executor()
+
+
+def test_recover_address_returns_the_signer(executor: None) -> None:
+    account = spawn_account()
+    signer = asyncio.run(signatures.recover_address("nonce", sign_message(account, "nonce")))
+    assert signer == account.address
+    assert asyncio.run(signatures.recover_address("nonce", "0x00")) is None
+    assert signatures._pending == 0
+
+
+def test_recover_address_refuses_beyond_the_queue_limit(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(signatures, "_pending", settings.SIGNATURE_QUEUE_LIMIT)
+    with pytest.raises(signatures.VerificationOverloaded):
+        asyncio.run(signatures.recover_address("nonce", "0x00"))
+
+
+def test_broken_pool_is_replaced(executor: None) -> None:
+    broken = BrokenExecutor()
+    signatures._executor = broken
+    with pytest.raises(signatures.VerificationUnavailable):
+        asyncio.run(signatures.recover_address("nonce", "0x00"))
+    assert broken.shut_down
+    assert signatures._pending == 0
+    assert signatures.get_executor() is not broken
@@ -0,0 +1,35 @@
+import random
+import string
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.crud.crud_cryptocurrencies import catalog
+from app.models.cryptocurrencies import Cryptocurrencies
+from app.schemas.cryptocurrency import Cryptocurrency
+
+
+def random_symbol() -> str:
+    return "".join(random.choices(string.ascii_uppercase, k=12))
+
+
+def test_catalog_follows_changes(db: Session) -> None:
+    symbol = random_symbol()
+    cryptocurrency = crud.crypto.create(db, Cryptocurrency(full_name="Test coin", symbol=symbol, details="-"))
+    assert crud.crypto.exists(db, symbol)
+    crud.crypto.update(db, cryptocurrency, Cryptocurrency(full_name="Renamed coin", symbol=symbol, details="-"))
+    assert crud.crypto.get_by_symbol(db, symbol).full_name == "Renamed coin"
+    crud.crypto.delete_by_id(db, cryptocurrency.id)
+    assert not crud.crypto.exists(db, symbol)
+
+
+def test_catalog_reads_skip_the_database(db: Session) -> None:
+    catalog.load(db)
+    symbols = [item.symbol for item in crud.crypto.get_all(db)]
+    assert [item.symbol for item in crud.crypto.get_all(None)] == symbols
+
+
+def test_stale_catalog_loads_without_a_session(db: Session) -> None:
+    catalog.expire()
+    symbols = [row.symbol for row in db.query(Cryptocurrencies).order_by(Cryptocurrencies.id)]
+    assert [item.symbol for item in crud.crypto.get_all()] == symbols
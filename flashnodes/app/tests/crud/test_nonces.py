@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.core import security
+from app.core.cache import TTLCache
+from app.crud.crud_nonces import CRUDNonces
+
+PUBLIC_ADDRESS = "0x" + "ab" * 20
+
+
+def new_token() -> str:
+    token = security.login_nonce_token(PUBLIC_ADDRESS, security.generate_login_nonce(PUBLIC_ADDRESS))
+    assert token is not None
+    return token
+
+
+def test_nonce_used_on_one_worker_is_rejected_by_another(db: Session) -> None:
+    # Each worker process has its own cache, only the database is shared
+    worker, other_worker = CRUDNonces(TTLCache()), CRUDNonces(TTLCache())
+    token = new_token()
+    expires_at = datetime.utcnow() + timedelta(minutes=5)
+    assert not other_worker.is_used(db, token)
+    assert worker.consume(db, token, expires_at)
+    assert other_worker.is_used(db, token)
+    assert not other_worker.consume(db, token, expires_at)
+
+
+def test_purge_expired_keeps_live_nonces(db: Session) -> None:
+    nonces = CRUDNonces(TTLCache())
+    expired, live = new_token(), new_token()
+    now = datetime.utcnow()
+    nonces.consume(db, expired, now - timedelta(seconds=1))
+    nonces.consume(db, live, now + timedelta(minutes=5))
+    assert nonces.purge_expired(db, now) >= 1
+    fresh = CRUDNonces(TTLCache())
+    assert not fresh.is_used(db, expired)
+    assert fresh.is_used(db, live)
@@ -0,0 +1,244 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import Any, List, Optional, Sequence, Set
+
+import pytest
+from celery.exceptions import SoftTimeLimitExceeded
+from kombu.exceptions import OperationalError
+from sqlalchemy.orm import Session
+
+from app import crud, worker
+from app.core import celery_app
+from app.core.config import settings
+from app.db.locks import EXPIRY_SWEEP_LOCK
+from app.deployer import Deployment, DeploymentError, StubDeployer
+from app.models.projects import ProjectMode, ProjectNetwork
+from app.tests.utils.db import FakeSession, fake_lock, fake_lock_connection, fake_try_lock
+from app.tests.utils.projects import create_random_project
+from app.worker import retry_countdown
+
+DEPLOYMENT = Deployment(
+    node_id="00000000-0000-0000-0000-000000000001",
+    cryptocurrency_symbol="ETH",
+    network="mainnet",
+    mode="full",
+    prefix="abcdefgh"
+)
+
+
+def test_expire_overdue_expires_only_active_projects_past_their_date(db: Session) -> None:
+    now = datetime.utcnow()
+    overdue = create_random_project(db, now - timedelta(days=1), status="active")
+    paid = create_random_project(db, now + timedelta(days=1), status="active")
+    pending = create_random_project(db, now - timedelta(days=1))
+
+    expired = []
+    while True:
+        batch = crud.projects.expire_overdue(db, now, 100)
+        expired += batch
+        if len(batch) < 100:
+            break
+    assert overdue.node_id in expired
+    assert paid.node_id not in expired
+    assert pending.node_id not in expired
+    for project, status in ((overdue, "expired"), (paid, "active"), (pending, "pending")):
+        db.refresh(project)
+        assert project.status == status
+    assert crud.projects.expire_overdue(db, now, 100) == []
+
+
+def test_get_node_ids_by_status_leaves_out_recent_changes(db: Session) -> None:
+    lost = create_random_project(db, datetime.utcnow() + timedelta(days=1))
+    waiting = create_random_project(db, datetime.utcnow() + timedelta(days=1))
+    lost.status_changed_on = datetime.utcnow() - timedelta(hours=2)
+    db.commit()
+    stale = crud.projects.get_node_ids_by_status(db, "pending", 1000, unchanged_for=timedelta(hours=1))
+    assert lost.node_id in stale
+    assert waiting.node_id not in stale
+    # The transition restarts the timeout
+    crud.projects.transition(db, str(lost.node_id), ("pending",), "pending")
+    stale = crud.projects.get_node_ids_by_status(db, "pending", 1000, unchanged_for=timedelta(hours=1))
+    assert lost.node_id not in stale
+
+
+@pytest.fixture()
+def overdue(monkeypatch: pytest.MonkeyPatch) -> List[int]:
+    node_ids = list(range(7))
+
+    def expire_overdue(db: Any, now: datetime, limit: int) -> List[int]:
+        batch = node_ids[:limit]
+        del node_ids[:limit]
+        return batch
+
+    monkeypatch.setattr(worker, "SessionLocal", FakeSession)
+    monkeypatch.setattr(crud.projects, "expire_overdue", expire_overdue)
+    monkeypatch.setattr(settings, "EXPIRY_SWEEP_BATCH_SIZE", 3)
+    return node_ids
+
+
+def test_expire_projects_sweeps_in_batches(overdue: List[int], monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(worker, "advisory_lock", fake_lock(EXPIRY_SWEEP_LOCK))
+    assert worker.expire_projects() == 7
+    assert overdue == []
+
+
+def test_expire_projects_skips_while_another_worker_sweeps(
+    overdue: List[int], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(worker, "advisory_lock", fake_lock())
+    assert worker.expire_projects() == 0
+    assert len(overdue) == 7
+
+
+def test_stub_deployer_fails_then_succeeds() -> None:
+    deployer = StubDeployer(failures=2)
+    for _ in range(2):
+        with pytest.raises(DeploymentError):
+            deployer.deploy(DEPLOYMENT)
+    assert deployer.deployed == []
+    deployer.deploy(DEPLOYMENT)
+    assert deployer.deployed == [DEPLOYMENT]
+
+
+def test_retry_countdown_is_capped(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "PROVISIONING_RETRY_BACKOFF", 30)
+    monkeypatch.setattr(settings, "PROVISIONING_RETRY_BACKOFF_MAX", 600)
+    for retries, low, high in ((0, 15, 30), (1, 30, 60), (4, 240, 480), (5, 300, 600), (11, 300, 600)):
+        for _ in range(20):
+            assert low <= retry_countdown(retries) <= high
+
+
+class FakeProjects:
+    """
+    Project statuses kept in memory, with the crud.projects calls the provisioning tasks make.
+    """
+    def __init__(self, **statuses: str) -> None:
+        self.statuses = statuses
+        self.transitions: List[tuple] = []
+        # Projects whose status is older than any `unchanged_for`
+        self.stale: Set[str] = set()
+
+    def get_by_node_id_internal(self, db: Any, node_id: str) -> Optional[tuple]:
+        if node_id not in self.statuses:
+            return None
+        project = SimpleNamespace(
+            node_id=node_id, cryptocurrency_symbol="ETH", network=ProjectNetwork.mainnet, mode=ProjectMode.full,
+            prefix="abcdefgh", status=self.statuses[node_id]
+        )
+        return project, "0xabc"
+
+    def transition(self, db: Any, node_id: str, from_statuses: Sequence[str], to_status: str) -> bool:
+        if self.statuses.get(node_id) not in from_statuses:
+            return False
+        self.transitions.append((self.statuses[node_id], to_status))
+        self.statuses[node_id] = to_status
+        self.stale.discard(node_id)
+        return True
+
+    def get_node_ids_by_status(self, db: Any, status: str, limit: int,
+                               unchanged_for: Optional[timedelta] = None) -> List[str]:
+        return [
+            node_id for node_id, value in self.statuses.items()
+            if value == status and (unchanged_for is None or node_id in self.stale)
+        ][:limit]
+
+
+@pytest.fixture()
+def provisioning(monkeypatch: pytest.MonkeyPatch) -> SimpleNamespace:
+    projects = FakeProjects(**{DEPLOYMENT.node_id: "pending"})
+    deployer = StubDeployer()
+    queued: List[tuple] = []
+    for name in ("get_by_node_id_internal", "transition", "get_node_ids_by_status"):
+        monkeypatch.setattr(crud.projects, name, getattr(projects, name))
+    monkeypatch.setattr(worker, "SessionLocal", FakeSession)
+    monkeypatch.setattr(worker, "get_deployer", lambda: deployer)
+    monkeypatch.setattr(worker, "deployment_lock", fake_lock(DEPLOYMENT.node_id))
+    monkeypatch.setattr(worker, "lock_connection", fake_lock_connection)
+    monkeypatch.setattr(worker, "try_deployment_lock", fake_try_lock(DEPLOYMENT.node_id))
+    monkeypatch.setattr(worker, "try_deployment_slot", fake_try_lock("ETH"))
+    monkeypatch.setattr(worker.deploy_project, "apply_async", lambda args, **options: queued.append((args, options)))
+    monkeypatch.setattr(worker.deploy_project, "delay", lambda *args: queued.append((list(args), {})))
+    return SimpleNamespace(projects=projects, deployer=deployer, queued=queued)
+
+
+def test_deploy_project_moves_pending_to_active(provisioning: SimpleNamespace) -> None:
+    assert worker.deploy_project.apply(args=[DEPLOYMENT.node_id]).get() == "active"
+    assert provisioning.projects.transitions == [("pending", "deploying"), ("deploying", "active")]
+    assert provisioning.deployer.deployed == [DEPLOYMENT]
+    # Running it again leaves the active project alone
+    assert worker.deploy_project.apply(args=[DEPLOYMENT.node_id]).get() == "active"
+    assert len(provisioning.deployer.deployed) == 1
+
+
+def test_deploy_project_waits_for_a_slot(provisioning: SimpleNamespace, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(worker, "try_deployment_slot", fake_try_lock())
+    assert worker.deploy_project.apply(args=[DEPLOYMENT.node_id]).get() == "pending"
+    assert provisioning.queued == [([DEPLOYMENT.node_id], {"countdown": settings.PROVISIONING_SLOT_WAIT})]
+    assert provisioning.projects.transitions == []
+
+
+def test_deploy_project_skips_a_project_being_deployed(
+    provisioning: SimpleNamespace, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(worker, "try_deployment_lock", fake_try_lock())
+    assert worker.deploy_project.apply(args=[DEPLOYMENT.node_id]).get() == "skipped"
+    assert provisioning.deployer.deployed == []
+
+
+def test_deploy_project_retries_from_pending(provisioning: SimpleNamespace, monkeypatch: pytest.MonkeyPatch) -> None:
+    provisioning.deployer.failures = 2
+    monkeypatch.setattr(worker, "retry_countdown", lambda retries: 0)
+    assert worker.deploy_project.apply(args=[DEPLOYMENT.node_id]).get() == "active"
+    assert provisioning.projects.transitions == [("pending", "deploying"), ("deploying", "pending")] * 2 + [
+        ("pending", "deploying"), ("deploying", "active")
+    ]
+
+
+def test_deploy_project_fails_when_retries_are_used_up(provisioning: SimpleNamespace) -> None:
+    provisioning.deployer.failures = 1
+    result = worker.deploy_project.apply(args=[DEPLOYMENT.node_id], retries=settings.PROVISIONING_MAX_RETRIES)
+    assert isinstance(result.result, DeploymentError)
+    assert provisioning.projects.statuses[DEPLOYMENT.node_id] == "failed"
+    # A failed project is left alone
+    assert worker.deploy_project.apply(args=[DEPLOYMENT.node_id]).get() == "failed"
+    assert worker.recover_deployments() == 0
+
+
+def test_deploy_project_fails_on_any_error(
+    provisioning: SimpleNamespace, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def time_out(deployment: Deployment) -> None:
+        raise SoftTimeLimitExceeded()
+
+    monkeypatch.setattr(provisioning.deployer, "deploy", time_out)
+    result = worker.deploy_project.apply(args=[DEPLOYMENT.node_id], retries=settings.PROVISIONING_MAX_RETRIES)
+    assert isinstance(result.result, SoftTimeLimitExceeded)
+    assert provisioning.projects.statuses[DEPLOYMENT.node_id] == "failed"
+
+
+def test_recover_deployments_requeues_abandoned_projects(provisioning: SimpleNamespace) -> None:
+    busy = "00000000-0000-0000-0000-000000000002"
+    provisioning.projects.statuses.update({DEPLOYMENT.node_id: "deploying", busy: "deploying"})
+    assert worker.recover_deployments() == 1
+    assert provisioning.projects.statuses == {DEPLOYMENT.node_id: "pending", busy: "deploying"}
+    assert provisioning.queued == [([DEPLOYMENT.node_id], {})]
+
+
+def test_recover_deployments_requeues_lost_pending_projects(provisioning: SimpleNamespace) -> None:
+    waiting = "00000000-0000-0000-0000-000000000002"
+    provisioning.projects.statuses[waiting] = "pending"
+    provisioning.projects.stale.add(DEPLOYMENT.node_id)
+    assert worker.recover_deployments() == 1
+    assert provisioning.queued == [([DEPLOYMENT.node_id], {})]
+    # Queued once per timeout
+    assert worker.recover_deployments() == 0
+
+
+def test_send_deployment_leaves_the_project_for_recovery_when_the_broker_is_down(
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def broker_down(*args: Any, **kwargs: Any) -> None:
+        raise OperationalError("connection refused")
+
+    monkeypatch.setattr(celery_app.celery_app, "send_task", broker_down)
+    assert not celery_app.send_deployment(DEPLOYMENT.node_id)
@@ -0,0 +1,189 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app import analytics, crud, worker
+from app.analytics import DAY, HOUR
+from app.db.session import AsyncSessionLocal
+from app.tests.utils.db import FakeSession
+from app.tests.utils.prometheus import FakePrometheus
+
+DAY_START = datetime(2020, 1, 1)
+NOW = 20_000 * DAY + 5 * HOUR + 600
+
+
+def get_series(api_keys: list, granularity: str, start: datetime, end: datetime) -> list:
+    async def read() -> list:
+        async with AsyncSessionLocal() as session:
+            return await crud.usage.get_series_async(session, api_keys, granularity, start, end)
+    return [(int(timestamp), requests) for timestamp, requests in asyncio.run(read())]
+
+
+def test_upsert_hour_overwrites_the_hour(db: Session) -> None:
+    api_key = str(uuid.uuid4())
+    crud.usage.upsert_hour(db, DAY_START, {api_key: 5})
+    crud.usage.upsert_hour(db, DAY_START, {api_key: 7})
+    # Bucket starts are stored as UTC
+    assert get_series([api_key], "hour", DAY_START, DAY_START + timedelta(hours=1)) == [(1577836800, 7)]
+
+
+def test_rollup_day_sums_the_hours_of_the_day(db: Session) -> None:
+    api_keys = [str(uuid.uuid4()), str(uuid.uuid4())]
+    for hour in range(3):
+        crud.usage.upsert_hour(db, DAY_START + timedelta(hours=hour), {api_key: 2 for api_key in api_keys})
+    # Belongs to the next day
+    crud.usage.upsert_hour(db, DAY_START + timedelta(days=1), {api_keys[0]: 100})
+    crud.usage.rollup_day(db, DAY_START)
+    days = get_series(api_keys, "day", DAY_START, DAY_START + timedelta(days=2))
+    assert [requests for _, requests in days] == [12]
+    assert len(get_series(api_keys, "hour", DAY_START, DAY_START + timedelta(days=1))) == 3
+
+
+def test_get_series_sums_only_the_given_keys(db: Session) -> None:
+    api_key, other = str(uuid.uuid4()), str(uuid.uuid4())
+    crud.usage.upsert_hour(db, DAY_START, {api_key: 1, other: 10})
+    series = get_series([api_key], "hour", DAY_START, DAY_START + timedelta(hours=1))
+    assert [requests for _, requests in series] == [1]
+
+
+class FakeUsage:
+    """
+    Records the rollup reads and writes instead of touching the database.
+    """
+    def __init__(self, first_hour: float = 0) -> None:
+        self.first_hour = first_hour
+        self.reads: List[tuple] = []
+        self.hours: Dict[datetime, Dict[str, int]] = {}
+        self.days: List[datetime] = []
+
+    async def get_series_async(self, db: Any, api_keys: List[str], granularity: str,
+                               start: datetime, end: datetime) -> List[tuple]:
+        self.reads.append((granularity, start, end))
+        step = DAY if granularity == "day" else HOUR
+        first = int((start - datetime(1970, 1, 1)).total_seconds())
+        last = int((end - datetime(1970, 1, 1)).total_seconds())
+        return [(timestamp, 1) for timestamp in range(-(-first // step) * step, last, step)]
+
+    async def get_first_hour_async(self, db: Any) -> float:
+        return self.first_hour
+
+    def upsert_hour(self, db: Any, bucket_start: datetime, requests: Dict[str, int]) -> None:
+        self.hours[bucket_start] = requests
+
+    def rollup_day(self, db: Any, day_start: datetime) -> None:
+        self.days.append(day_start)
+
+
+@pytest.fixture()
+def fake_usage(monkeypatch: pytest.MonkeyPatch) -> FakeUsage:
+    usage = FakeUsage()
+    for name in ("get_series_async", "get_first_hour_async", "upsert_hour", "rollup_day"):
+        monkeypatch.setattr(crud.usage, name, getattr(usage, name))
+    monkeypatch.setattr(worker, "SessionLocal", FakeSession)
+    analytics.analytics_cache.clear()
+    analytics.coverage_cache.clear()
+    return usage
+
+
+def test_read_rollups_uses_hours_below_30d(fake_usage: FakeUsage) -> None:
+    rows = asyncio.run(analytics.read_rollups(None, ["key"], "7d", NOW - 7 * DAY, NOW - NOW % HOUR - HOUR))
+    assert [read[0] for read in fake_usage.reads] == ["hour"]
+    assert len(rows) == 7 * 24 - 2
+
+
+def test_read_rollups_splits_30d_into_days_and_partial_hours(fake_usage: FakeUsage) -> None:
+    start, end = NOW - 30 * DAY, NOW - NOW % HOUR - HOUR
+    rows = asyncio.run(analytics.read_rollups(None, ["key"], "30d", start, end))
+    first_day = datetime.utcfromtimestamp(start - start % DAY + DAY)
+    last_day = datetime.utcfromtimestamp(NOW - NOW % DAY)
+    assert fake_usage.reads == [
+        ("hour", datetime.utcfromtimestamp(start), first_day),
+        ("day", first_day, last_day),
+        ("hour", last_day, datetime.utcfromtimestamp(end))
+    ]
+    # 18 hours of the first day, 29 whole days and 4 hours of today
+    assert len(rows) == 18 + 29 + 4
+
+
+def test_read_live_splits_previous_and_current_hour(fake_prometheus: FakePrometheus) -> None:
+    live = asyncio.run(analytics.read_live([str(uuid.uuid4())], NOW))
+    assert live == [[NOW - NOW % HOUR - HOUR, 1.0], [NOW - NOW % HOUR, 1.0]]
+    queries = [request["params"]["query"] for request in fake_prometheus.requests]
+    assert any("[3600s] offset 600s" in query for query in queries)
+    assert any("[600s])" in query for query in queries)
+
+
+def test_read_live_returns_none_without_prometheus(fake_prometheus: FakePrometheus) -> None:
+    fake_prometheus.stop()
+    assert asyncio.run(analytics.read_live([str(uuid.uuid4())], NOW)) is None
+
+
+def test_rollup_chart_merges_live_hours(
+    fake_usage: FakeUsage, fake_prometheus: FakePrometheus, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(analytics.time, "time", lambda: NOW)
+    chart = asyncio.run(analytics.get_rollup_analytics(None, [str(uuid.uuid4())], "1d", 99))
+    # Capped to one bucket per rolled up hour, every hour holds a single row
+    assert len(chart) == 24
+    assert [step["value"] for step in chart] == [1] * 24
+    assert chart[-1]["timestamp"] == NOW - NOW % HOUR
+
+
+def test_rollup_chart_reads_prometheus_until_rollups_cover_it(
+    fake_usage: FakeUsage, fake_prometheus: FakePrometheus, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(analytics.time, "time", lambda: NOW)
+    fake_usage.first_hour = NOW - NOW % HOUR - 3 * HOUR
+    asyncio.run(analytics.get_rollup_analytics(None, [str(uuid.uuid4())], "1d", 6))
+    assert fake_usage.reads == []
+    assert fake_prometheus.requests[0]["params"]["query"].endswith("[1d:10m]")
+
+
+def test_rollups_since_is_cached_apart_from_the_charts(fake_usage: FakeUsage) -> None:
+    fake_usage.first_hour = NOW - DAY
+    chart_stats = analytics.analytics_cache.stats()
+    assert asyncio.run(analytics.rollups_since(None)) == NOW - DAY
+    fake_usage.first_hour = NOW
+    assert asyncio.run(analytics.rollups_since(None)) == NOW - DAY
+    assert analytics.analytics_cache.stats() == chart_stats
+
+
+def test_rollup_usage_stores_hours_and_refreshes_their_days(
+    fake_usage: FakeUsage, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    api_key = str(uuid.uuid4())
+    # 01:10, three hours back reach into the previous day
+    now = NOW - 4 * HOUR
+    monkeypatch.setattr(worker.time, "time", lambda: now)
+    monkeypatch.setattr(worker, "query_sync", lambda query, time: [
+        {"metric": {"api_key": api_key}, "value": [time, "41.6"]},
+        {"metric": {"api_key": "not-a-key"}, "value": [time, "3"]},
+        {"metric": {}, "value": [time, "3"]}
+    ])
+    assert worker.rollup_usage() == 2
+    last_hour = now - now % HOUR
+    assert sorted(fake_usage.hours) == [datetime.utcfromtimestamp(last_hour - hours * HOUR) for hours in (3, 2, 1)]
+    assert all(requests == {api_key: 42} for requests in fake_usage.hours.values())
+    assert sorted(fake_usage.days) == [datetime.utcfromtimestamp(NOW - NOW % DAY - DAY),
+                                       datetime.utcfromtimestamp(NOW - NOW % DAY)]
+
+
+def test_backfill_usage_pages_by_day(fake_usage: FakeUsage, monkeypatch: pytest.MonkeyPatch) -> None:
+    api_key = str(uuid.uuid4())
+    ranges = []
+
+    def query_range_sync(query: str, start: float, end: float, step: int) -> List[Dict]:
+        ranges.append((start, end))
+        return [{"metric": {"api_key": api_key},
+                 "values": [[timestamp, "1"] for timestamp in range(int(start), int(end) + 1, step)]}]
+
+    monkeypatch.setattr(worker.time, "time", lambda: NOW)
+    monkeypatch.setattr(worker, "query_range_sync", query_range_sync)
+    assert worker.backfill_usage(2) == 48
+    last_hour = NOW - NOW % HOUR
+    assert ranges == [(last_hour - DAY + HOUR, last_hour), (last_hour - 2 * DAY + HOUR, last_hour - DAY)]
+    assert len(fake_usage.hours) == 48
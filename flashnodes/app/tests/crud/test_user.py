@@ -1,8 +1,14 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 
 from app import crud
-from app.core.security import verify_password
+from app.api.deps import get_current_active_superuser, get_user_cached
+from app.core.security import create_access_token, verify_password
+from app.crud.crud_user import user_cache
 from app.schemas.user import UserCreate, UserUpdate
 from app.tests.utils.utils import random_email, random_lower_string
 
@@ -92,3 +98,29 @@ def test_update_user(db: Session) -> None:
     assert user_2
     assert user.email == user_2.email
     assert verify_password(new_password, user_2.hashed_password)
+
+
+def test_update_user_invalidates_identity_cache(db: Session) -> None:
+    email = random_email()
+    user_in = UserCreate(email=email, password=random_lower_string())
+    user = crud.user.create(db, obj_in=user_in)
+    get_user_cached(db, user.id)
+    assert user_cache.get(user.id)["email"] == email
+    crud.user.update(db, db_obj=user, obj_in={"full_name": "Updated"})
+    assert user_cache.get(user.id) is None
+
+
+def test_remove_user_invalidates_identity_cache(db: Session) -> None:
+    user = crud.user.create(db, obj_in=UserCreate(email=random_email(), password=random_lower_string()))
+    get_user_cached(db, user.id)
+    crud.user.remove(db, id=user.id)
+    assert user_cache.get(user.id) is None
+
+
+def test_superuser_check_reads_past_the_identity_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    user_cache.set(1, {"id": 1, "is_active": True, "is_superuser": True})
+    monkeypatch.setattr(crud.user, "get", lambda db, id: SimpleNamespace(id=id, is_active=True, is_superuser=False))
+    with pytest.raises(HTTPException) as e:
+        get_current_active_superuser(db=Session(), token=create_access_token(1))
+    assert e.value.status_code == 400
+    user_cache.invalidate(1)
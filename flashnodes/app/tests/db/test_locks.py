@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from app.db.locks import (
+    EXPIRY_SWEEP_LOCK,
+    advisory_lock,
+    deployment_lock,
+    lock_connection,
+    try_deployment_lock,
+    try_deployment_slot,
+)
+from app.tests.utils.projects import create_random_project
+from app.worker import expire_projects
+
+
+def test_advisory_lock_is_taken_once() -> None:
+    with advisory_lock(EXPIRY_SWEEP_LOCK) as acquired:
+        assert acquired
+        with advisory_lock(EXPIRY_SWEEP_LOCK) as acquired_again:
+            assert not acquired_again
+    with advisory_lock(EXPIRY_SWEEP_LOCK) as acquired:
+        assert acquired
+
+
+def test_deployment_slots_are_limited() -> None:
+    with lock_connection() as first, lock_connection() as second, lock_connection() as third:
+        assert try_deployment_slot(first, "TEST", "mainnet", 2)
+        assert try_deployment_slot(second, "TEST", "mainnet", 2)
+        assert not try_deployment_slot(third, "TEST", "mainnet", 2)
+        assert try_deployment_slot(third, "TEST", "testnet", 2)
+
+
+def test_deployment_takes_its_locks_on_one_connection() -> None:
+    node_id = "00000000-0000-0000-0000-000000000001"
+    with lock_connection() as locks:
+        assert try_deployment_lock(locks, node_id)
+        assert try_deployment_slot(locks, "TEST", "mainnet", 1)
+        with deployment_lock(node_id) as abandoned:
+            assert not abandoned
+    with deployment_lock(node_id) as abandoned:
+        assert abandoned
+
+
+def test_expiry_sweep_runs_in_one_worker_at_a_time(db: Session) -> None:
+    project = create_random_project(db, datetime.utcnow() - timedelta(days=1), status="active")
+    with advisory_lock(EXPIRY_SWEEP_LOCK):
+        assert expire_projects() == 0
+    db.refresh(project)
+    assert project.status == "active"
+    assert expire_projects() >= 1
+    db.refresh(project)
+    assert project.status == "expired"
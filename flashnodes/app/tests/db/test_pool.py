@@ -0,0 +1,30 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.core.config import settings
+from app.db.pool import InstrumentedQueuePool, ping_idle_connections, pool_stats
+
+
+def test_pool_stats_track_checkouts(tmp_path: Path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=InstrumentedQueuePool,
+                           pool_size=2, max_overflow=1)
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+        stats = pool_stats(engine)
+        assert stats["checked_out"] == 1
+        assert stats["checkout_wait"]["count"] == 1
+    assert pool_stats(engine)["checked_out"] == 0
+
+
+def test_dead_idle_connection_is_replaced(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "DB_POOL_PING_IDLE_SECONDS", 0)
+    engine = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=InstrumentedQueuePool, pool_size=1)
+    ping_idle_connections(engine)
+    with engine.connect() as connection:
+        dead = connection.connection.dbapi_connection
+    dead.close()
+    with engine.connect() as connection:
+        assert connection.connection.dbapi_connection is not dead
+        assert connection.execute(text("SELECT 1")).scalar() == 1
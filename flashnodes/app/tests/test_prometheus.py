@@ -0,0 +1,52 @@
+import asyncio
+import uuid
+
+import pytest
+
+from app import prometheus
+from app.core import metrics
+from app.core.config import settings
+from app.tests.utils.prometheus import FakePrometheus
+
+
+def test_get_analytics_total_resamples_to_steps(fake_prometheus: FakePrometheus) -> None:
+    fake_prometheus.points = 10
+    chart = asyncio.run(prometheus.get_analytics_total([str(uuid.uuid4())], "1h", 6))
+    assert len(chart) == 6
+    assert sum(step["value"] for step in chart) == 10
+    assert "sum(" in fake_prometheus.requests[0]["params"]["query"]
+
+
+def test_get_analytics_is_cached(fake_prometheus: FakePrometheus) -> None:
+    api_key = str(uuid.uuid4())
+    first = asyncio.run(prometheus.get_analytics(api_key, "1h", 6))
+    second = asyncio.run(prometheus.get_analytics(api_key, "1h", 6))
+    assert first == second
+    assert len(fake_prometheus.requests) == 1
+
+
+def test_get_analytics_total_splits_api_keys(
+    fake_prometheus: FakePrometheus, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "PROMETHEUS_KEY_CHUNK_SIZE", 100)
+    api_keys = [str(uuid.uuid4()) for _ in range(250)]
+    asyncio.run(prometheus.get_analytics_total(api_keys, "1h", 6))
+    assert len(fake_prometheus.requests) == 3
+    assert "POST" in {request["method"] for request in fake_prometheus.requests}
+
+
+def test_analytics_cache_is_published_with_the_metrics(fake_prometheus: FakePrometheus) -> None:
+    api_key = str(uuid.uuid4())
+    for _ in range(2):
+        asyncio.run(prometheus.get_analytics_total([api_key], "1h", 10))
+    stats = metrics.snapshot()["analytics_cache"]
+    assert stats["hits"] >= 1 and stats["misses"] >= 1
+
+
+def test_sync_queries_share_one_client(fake_prometheus: FakePrometheus) -> None:
+    prometheus.query_sync("up")
+    client = prometheus.get_sync_client()
+    prometheus.query_range_sync("up", 0, 60, 30)
+    assert prometheus.get_sync_client() is client
+    assert [request["path"] for request in fake_prometheus.requests] == ["/api/v1/query", "/api/v1/query_range"]
+    client.close()
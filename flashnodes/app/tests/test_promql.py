@@ -0,0 +1,39 @@
+import asyncio
+import uuid
+
+from app import prometheus, promql
+from app.tests.utils.prometheus import FakePrometheus
+
+
+def test_matchers_escape_quotes_and_backslashes() -> None:
+    assert promql.eq("api_key", 'a"b\\c') == 'api_key="a\\"b\\\\c"'
+    assert promql.regex("api_key", ["a", 'b"']) == 'api_key=~"a|b\\""'
+
+
+def test_selector_skips_empty_matchers() -> None:
+    assert promql.selector("requests", None, 'api_key="a"', "") == 'requests{api_key="a"}'
+
+
+def test_aggregation_and_subquery() -> None:
+    expr = promql.range_function("delta", "requests", "10m")
+    assert promql.aggregate("sum", expr) == "sum(delta(requests[10m]))"
+    assert promql.aggregate("sum", expr, ["api_key"]) == "sum by (api_key) (delta(requests[10m]))"
+    assert promql.subquery("x", "1d", "10m") == "(x)[1d:10m]"
+    assert promql.range_function("delta", "requests", "1h", "2h") == "delta(requests[1h] offset 2h)"
+    assert promql.topk(3, "x") == "topk(3, x)"
+
+
+def test_requests_query_aggregates_before_the_subquery() -> None:
+    query = prometheus.requests_query(promql.eq("api_key", "a"), "1d", "sum", by=["api_key"])
+    assert query.startswith("(sum by (api_key) (delta(")
+    assert query.endswith(")[1d:10m]")
+
+
+def test_get_analytics_breakdown_keeps_api_keys_apart(fake_prometheus: FakePrometheus) -> None:
+    fake_prometheus.series = 2
+    fake_prometheus.points = 10
+    api_keys = [str(uuid.uuid4()) for _ in range(2)]
+    charts = asyncio.run(prometheus.get_analytics_breakdown(api_keys, "1h", 6))
+    assert set(charts) == {str(uuid.UUID(int=0)), str(uuid.UUID(int=1))}
+    assert all(sum(step["value"] for step in chart) == 10 for chart in charts.values())
+    assert "sum by (api_key)" in fake_prometheus.requests[0]["params"]["query"]
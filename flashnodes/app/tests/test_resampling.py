@@ -0,0 +1,54 @@
+from app.resampling import resample
+from app.utils import generate_bucket_timestamps
+
+NOW = 1_000_000 * 600 + 30
+
+
+def test_resample_merges_series_into_aligned_buckets() -> None:
+    first = [[NOW - 1200, "1"], [NOW - 610, "2"], [NOW - 10, "3"]]
+    second = [[NOW - 1190, "4"], [NOW - 20, "0.5"]]
+    chart = resample([first, second], 3600, 6, now=NOW)
+    assert [step["timestamp"] % 600 for step in chart] == [0] * 6
+    assert chart[-1]["timestamp"] <= NOW < chart[-1]["timestamp"] + 600
+    assert [step["value"] for step in chart] == [0, 0, 0, 5, 2, 4]
+
+
+def test_resample_aggregations() -> None:
+    series = [[[NOW - 20, "1"], [NOW - 10, "3"]]]
+    assert resample(series, 3600, 6, "avg", now=NOW)[-1]["value"] == 2
+    assert resample(series, 3600, 6, "max", now=NOW)[-1]["value"] == 3
+    assert resample(series, 3600, 6, "rate", now=NOW)[-1]["value"] == round(4 / 600, 2)
+
+
+def test_resample_without_series_fills_zeros() -> None:
+    chart = resample([], 30 * 86400, 6, now=NOW)
+    assert len(chart) == 6
+    assert all(step["value"] == 0 for step in chart)
+
+
+def test_resample_widens_buckets_to_whole_points() -> None:
+    # 99 buckets of 36s over 30s points would alternate one and two points per bucket
+    series = [[[NOW - offset, "1"] for offset in range(0, 3600, 30)]]
+    chart = resample(series, 3600, 99, now=NOW, resolution=30)
+    assert len(chart) == 60
+    assert chart[1]["timestamp"] - chart[0]["timestamp"] == 60
+    assert {step["value"] for step in chart[1:-1]} == {2}
+
+
+def test_resample_counts_leading_partial_bucket() -> None:
+    series = [[[NOW - offset, "1"] for offset in range(0, 3600, 30)]]
+    chart = resample(series, 3600, 6, now=NOW, resolution=30)
+    assert chart[0]["timestamp"] > NOW - 3600
+    assert sum(step["value"] for step in chart) == 120
+    assert chart[0]["value"] == 18 + 20
+    assert resample([[[NOW - 3601, "1"]]], 3600, 6, now=NOW)[0]["value"] == 0
+
+
+def test_bucket_timestamps_are_bucket_starts() -> None:
+    buckets = generate_bucket_timestamps(3600, 6, NOW)
+    assert len(buckets) == 6 and buckets.step == 600
+    assert buckets[-1] == NOW - NOW % 600
+    # 99 steps of a 30s resolution round up to 60s buckets, so only 60 of them cover the hour
+    buckets = generate_bucket_timestamps(3600, 99, NOW, resolution=30)
+    assert len(buckets) == 60 and buckets.step == 60
+    assert buckets[0] % 60 == 0 and buckets[-1] <= NOW < buckets[-1] + 60
@@ -0,0 +1,34 @@
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+
+class FakeSession:
+    """
+    Stand-in for `SessionLocal()` in tasks whose crud calls are replaced.
+    """
+    def close(self) -> None:
+        pass
+
+
+def fake_lock(*free: Any) -> Callable:
+    """
+    Stand-in for the advisory lock context managers, only the locks named by their first argument in `free` are taken.
+    """
+    @contextmanager
+    def take(*args: Any) -> Iterator[bool]:
+        yield bool(args) and args[0] in free
+    return take
+
+
+def fake_try_lock(*free: Any) -> Callable:
+    """
+    Stand-in for the `try_*` advisory lock functions, which take the lock connection first.
+    """
+    def take(connection: Any, *args: Any) -> bool:
+        return bool(args) and args[0] in free
+    return take
+
+
+@contextmanager
+def fake_lock_connection() -> Iterator[None]:
+    yield None
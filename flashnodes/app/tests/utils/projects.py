@@ -0,0 +1,54 @@
+import random
+import string
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any
+
+from sqlalchemy.orm import Session
+
+from app import crud
+from app.models.projects import ProjectMode, ProjectNetwork, Projects
+from app.schemas.cryptocurrency import Cryptocurrency
+from app.schemas.project import ProjectDB
+from app.tests.utils.user import create_random_user
+
+
+def project_row(id: int, **values: Any) -> SimpleNamespace:
+    """
+    Stand-in for a `PROJECT_COLUMNS` row of `crud.projects.get_all_internal`.
+    """
+    row = {
+        "id": id,
+        "node_id": uuid.uuid4(),
+        "cryptocurrency_symbol": "ETH",
+        "cryptocurrency_full_name": "Ethereum",
+        "mode": ProjectMode.full,
+        "network": ProjectNetwork.mainnet,
+        "is_paid": True,
+        "paid_until": datetime(2030, 1, 1),
+        "created_on": datetime(2026, 1, 1),
+        "api_key": uuid.uuid4(),
+        "status": "active",
+        "public_address": "0xabc",
+        "prefix": "abcdefgh"
+    }
+    row.update(values)
+    return SimpleNamespace(**row)
+
+
+def create_random_project(db: Session, paid_until: datetime, status: str = "pending") -> Projects:
+    symbol = "".join(random.choices(string.ascii_uppercase, k=12))
+    crud.crypto.create(db, Cryptocurrency(full_name="Test coin", symbol=symbol, details="-"))
+    project = crud.projects.create(db, ProjectDB(
+        user_id=create_random_user(db).id,
+        cryptocurrency_symbol=symbol,
+        mode="full",
+        network="mainnet",
+        pay_until=paid_until.isoformat(),
+        prefix="".join(random.choices(string.ascii_lowercase, k=8))
+    ))
+    if status != project.status:
+        crud.projects.transition(db, str(project.node_id), (project.status,), status)
+        db.refresh(project)
+    return project
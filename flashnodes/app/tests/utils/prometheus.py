@@ -0,0 +1,114 @@
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlparse
+
+
+class FakePrometheus:
+    def __init__(self, series: int = 1, points: int = 60, latency: float = 0.0, value: float = 1.0):
+        """
+        Local stand-in for the Prometheus HTTP API, answers `/api/v1/query` and `/api/v1/query_range`.
+
+        **Parameters**
+
+        * `series`: Number of series in every result
+        * `points`: Points per series of subquery (matrix) results
+        * `latency`: Seconds to wait before answering
+        * `value`: Value of every point
+        """
+        self.series = series
+        self.points = points
+        self.latency = latency
+        self.value = value
+        self.requests: List[Dict[str, Any]] = []
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        assert self._server, "server is not running"
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def labels(self, index: int) -> Dict[str, str]:
+        return {"api_key": str(uuid.UUID(int=index))}
+
+    def vector(self) -> Dict:
+        now = time.time()
+        return {
+            "resultType": "vector",
+            "result": [{
+                "metric": self.labels(i),
+                "value": [now, str(self.value)]
+            } for i in range(self.series)]
+        }
+
+    def matrix(self, start: float, end: float, step: float) -> Dict:
+        timestamps: List[float] = []
+        timestamp = start
+        while timestamp <= end and len(timestamps) < self.points:
+            timestamps.append(timestamp)
+            timestamp += step
+        return {
+            "resultType": "matrix",
+            "result": [{
+                "metric": self.labels(i),
+                "values": [[timestamp, str(self.value)] for timestamp in timestamps]
+            } for i in range(self.series)]
+        }
+
+    def respond(self, path: str, params: Dict[str, str]) -> Dict:
+        if path == "/api/v1/query_range":
+            data = self.matrix(float(params["start"]), float(params["end"]), float(params["step"]))
+        elif params.get("query", "").endswith("]"):
+            # Subquery, Prometheus returns a range of points ending now
+            now = time.time()
+            data = self.matrix(now - self.points * 30, now, 30)
+        else:
+            data = self.vector()
+        return {"status": "success", "data": data}
+
+    def start(self) -> "FakePrometheus":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def handle_request(self, params: Dict[str, str]) -> None:
+                path = urlparse(self.path).path
+                fake.requests.append({"method": self.command, "path": path, "params": params})
+                if fake.latency:
+                    time.sleep(fake.latency)
+                body = json.dumps(fake.respond(path, params)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self) -> None:
+                self.handle_request(dict(parse_qsl(urlparse(self.path).query)))
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0))
+                self.handle_request(dict(parse_qsl(self.rfile.read(length).decode())))
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "FakePrometheus":
+        return self.start()
+
+    def __exit__(self, *args: Any) -> None:
+        self.stop()
@@ -1,9 +1,11 @@
+import base64
+import binascii
 import logging
 import secrets
 from datetime import datetime, timedelta
-from math import ceil
 from pathlib import Path
-from typing import Any, Dict, Optional, List, Literal
+from typing import Any, Dict, Optional, Literal
+from uuid import UUID
 
 import emails
 from emails.template import JinjaTemplate
@@ -112,23 +114,44 @@ def generate_nonce_url_safe() -> str:
     return settings.NONCE_MESSAGE + secrets.token_urlsafe(16)
 
 
-def generate_timestamp_list(hours: int = 0, days: int = 0):
-    hours += days * 24
-    seconds = hours * 3600
-    date_now = int(datetime.now().timestamp())
-    return range(date_now-seconds, date_now)
+def generate_bucket_timestamps(seconds: int, steps: int, now: Optional[int] = None, resolution: int = 1) -> range:
+    """
+    Start timestamps of at most `steps` buckets covering the last `seconds`.
 
+    The width is rounded up to a multiple of `resolution`, so every bucket gets the same number of
+    data points, and fewer buckets are returned when the wider ones already cover the range.
+    Buckets are aligned to multiples of their width, the last one holds `now`, and a chart point carries
+    the start of its bucket.
+    """
+    width = -(-max(seconds // steps, 1) // resolution) * resolution
+    steps = min(steps, -(-seconds // width))
+    if now is None:
+        now = int(datetime.now().timestamp())
+    first = now - now % width - (steps - 1) * width
+    return range(first, first + steps * width, width)
 
-def split_list(a, n):
-    k, m = divmod(len(a), n)
-    return (a[i*k+min(i, m):(i+1)*k+min(i+1, m)] for i in range(n))
 
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
 
-def collapse_prometheus_response(response: List[Dict], step: int):
-    return [{
-        "timestamp": chunk[-1]["timestamp"],
-        "value": int(sum(item["value"] for item in chunk)/len(chunk))  # Exceptional cases?
-    } for chunk in split_list(response, step)]
+
+def decode_cursor(cursor: str) -> Optional[int]:
+    """
+    Id encoded by `encode_cursor`, `None` for a malformed cursor.
+    """
+    try:
+        value = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def is_uuid(value: Optional[str]) -> bool:
+    try:
+        UUID(str(value))
+    except ValueError:
+        return False
+    return True
 
 
 def literal_to_seconds(timerange: Literal["1h", "1d", "7d", "30d"]):
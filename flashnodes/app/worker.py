@@ -1,11 +1,237 @@
+import logging
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Tuple
+
+from celery import Task
 from raven import Client
 
+from app import crud
+from app.analytics import DAY, HOUR
 from app.core.celery_app import celery_app
 from app.core.config import settings
+from app.db.locks import (
+    EXPIRY_SWEEP_LOCK,
+    advisory_lock,
+    deployment_lock,
+    lock_connection,
+    try_deployment_lock,
+    try_deployment_slot,
+)
+from app.db.session import SessionLocal
+from app.deployer import Deployment, get_deployer
+from app.prometheus import query_range_sync, query_sync, window_query
+from app.utils import is_uuid
 
 client_sentry = Client(settings.SENTRY_DSN)
 
+logger = logging.getLogger(__name__)
+
 
-@celery_app.task(acks_late=True)
+@celery_app.task
 def test_celery(word: str) -> str:
     return f"test task return {word}"
+
+
+def requests_by_api_key(metrics: Iterable[Tuple[Dict, str]]) -> Dict[str, int]:
+    return {
+        labels["api_key"]: max(round(float(value)), 0)
+        for labels, value in metrics if is_uuid(labels.get("api_key"))
+    }
+
+
+def store_hours(hours: Dict[int, Dict[str, int]]) -> int:
+    """
+    Upsert the per api key requests of the hours ending at the given timestamps,
+    then refresh the daily rows they belong to. Returns the number of days refreshed.
+    """
+    days = set()
+    db = SessionLocal()
+    try:
+        for hour_end, requests in hours.items():
+            bucket_start = datetime.utcfromtimestamp(hour_end - HOUR)
+            crud.usage.upsert_hour(db, bucket_start, requests)
+            days.add(datetime(bucket_start.year, bucket_start.month, bucket_start.day))
+        for day_start in days:
+            crud.usage.rollup_day(db, day_start)
+    finally:
+        db.close()
+    return len(days)
+
+
+@celery_app.task
+def rollup_usage() -> int:
+    """
+    Store per api key requests of the last complete hours, then refresh the daily rows they belong to.
+
+    Every run rewrites USAGE_ROLLUP_LOOKBACK_HOURS hours, so a missed run is caught up by the next one.
+    """
+    now = int(time.time())
+    last_hour = now - now % HOUR
+    hours = {}
+    for hour in range(settings.USAGE_ROLLUP_LOOKBACK_HOURS):
+        hour_end = last_hour - hour * HOUR
+        result = query_sync(window_query(None, HOUR, by=["api_key"]), time=hour_end)
+        hours[hour_end] = requests_by_api_key((metric["metric"], metric["value"][1]) for metric in result)
+    return store_hours(hours)
+
+
+@celery_app.task
+def backfill_usage(days: int = 30) -> int:
+    """
+    Roll up the last `days` days from Prometheus, one range query per day, returns the number of hours stored.
+
+    Run once after the rollup table is created, charts keep reading Prometheus until the rollups cover
+    their range. Safe to repeat, the rows are upserted.
+    """
+    now = int(time.time())
+    last_hour = now - now % HOUR
+    stored = 0
+    for day in range(days):
+        end = last_hour - day * DAY
+        result = query_range_sync(window_query(None, HOUR, by=["api_key"]), end - DAY + HOUR, end, HOUR)
+        hours: Dict[int, List[Tuple[Dict, str]]] = defaultdict(list)
+        for metric in result:
+            for timestamp, value in metric["values"]:
+                hours[int(timestamp)].append((metric["metric"], value))
+        store_hours({hour_end: requests_by_api_key(metrics) for hour_end, metrics in hours.items()})
+        stored += len(hours)
+    logger.info("Backfilled %d hours of usage rollups", stored)
+    return stored
+
+
+@celery_app.task
+def expire_projects() -> int:
+    """
+    Expire active projects whose paid_until has passed, EXPIRY_SWEEP_BATCH_SIZE rows per transaction.
+
+    Only one worker sweeps at a time, the others return right away.
+    """
+    expired = 0
+    with advisory_lock(EXPIRY_SWEEP_LOCK) as acquired:
+        if not acquired:
+            return expired
+        db = SessionLocal()
+        try:
+            while True:
+                node_ids = crud.projects.expire_overdue(db, datetime.utcnow(), settings.EXPIRY_SWEEP_BATCH_SIZE)
+                expired += len(node_ids)
+                if len(node_ids) < settings.EXPIRY_SWEEP_BATCH_SIZE:
+                    break
+        finally:
+            db.close()
+    if expired:
+        logger.info("Expired %d overdue projects", expired)
+    return expired
+
+
+@celery_app.task
+def purge_used_nonces() -> int:
+    """
+    Delete the record of login nonces that expired since, returns how many.
+    """
+    db = SessionLocal()
+    try:
+        return crud.nonces.purge_expired(db, datetime.utcnow())
+    finally:
+        db.close()
+
+
+def retry_countdown(retries: int) -> float:
+    """
+    Exponential backoff with full jitter between half and all of the capped delay.
+    """
+    delay = min(settings.PROVISIONING_RETRY_BACKOFF * 2 ** retries, settings.PROVISIONING_RETRY_BACKOFF_MAX)
+    return random.uniform(delay / 2, delay)
+
+
+@celery_app.task(bind=True, max_retries=settings.PROVISIONING_MAX_RETRIES)
+def deploy_project(self: Task, node_id: str) -> str:
+    """
+    Drive a project from pending through deploying to active, returns the status it ends in.
+
+    Safe to run more than once for the same project, a project that is no longer pending or
+    deploying, or that another worker is deploying, is left alone. Whatever makes a deployment fail,
+    the soft time limit included, sets the project back to pending; it is retried with backoff
+    until the retries are used up, then it is left failed.
+    """
+    db = SessionLocal()
+    try:
+        project = crud.projects.get_by_node_id_internal(db, node_id)
+        if not project:
+            return "not_found"
+        project, _ = project
+        if project.status not in ("pending", "deploying"):
+            return project.status
+        deployment = Deployment(
+            node_id=str(project.node_id),
+            cryptocurrency_symbol=project.cryptocurrency_symbol,
+            network=project.network.value,
+            mode=project.mode.value,
+            prefix=project.prefix
+        )
+        # Both locks on one connection, the session gives its connection back with every commit, so a
+        # deployment in flight holds a single pool connection
+        with lock_connection() as locks:
+            if not try_deployment_lock(locks, node_id):
+                return "skipped"
+            if not try_deployment_slot(locks, deployment.cryptocurrency_symbol, deployment.network,
+                                       settings.PROVISIONING_CONCURRENCY):
+                # Waiting for a slot is not a failure, so it does not use up a retry
+                deploy_project.apply_async(args=[node_id], countdown=settings.PROVISIONING_SLOT_WAIT)
+                return project.status
+            if not crud.projects.transition(db, node_id, ("pending", "deploying"), "deploying"):
+                return "skipped"
+            try:
+                get_deployer().deploy(deployment)
+            except Exception as e:
+                if self.request.retries >= self.max_retries:
+                    crud.projects.transition(db, node_id, ("deploying",), "failed")
+                    logger.error("Deployment of %s failed for good: %r", node_id, e)
+                    raise
+                crud.projects.transition(db, node_id, ("deploying",), "pending")
+                logger.warning("Deployment of %s failed, retrying: %r", node_id, e)
+                raise self.retry(exc=e, countdown=retry_countdown(self.request.retries))
+            crud.projects.transition(db, node_id, ("deploying",), "active")
+        return "active"
+    finally:
+        db.close()
+
+
+@celery_app.task
+def recover_deployments() -> int:
+    """
+    Hand lost deployments back to the queue, returns how many.
+
+    A worker killed at its hard time limit or lost with its machine has its message acknowledged
+    and can't set the project back to pending itself, a project whose message never reached the
+    broker stays pending without a task. A project waiting for a free slot longer than
+    PROVISIONING_PENDING_TIMEOUT gets a second task, which is harmless.
+    """
+    recovered = 0
+    db = SessionLocal()
+    try:
+        for node_id in map(str, crud.projects.get_node_ids_by_status(
+            db, "deploying", settings.PROVISIONING_RECOVERY_BATCH_SIZE
+        )):
+            with deployment_lock(node_id) as abandoned:
+                if not abandoned or not crud.projects.transition(db, node_id, ("deploying",), "pending"):
+                    continue
+            deploy_project.delay(node_id)
+            recovered += 1
+        for node_id in map(str, crud.projects.get_node_ids_by_status(
+            db, "pending", settings.PROVISIONING_RECOVERY_BATCH_SIZE,
+            unchanged_for=timedelta(seconds=settings.PROVISIONING_PENDING_TIMEOUT)
+        )):
+            # Restarts the timeout, so a project is queued once per timeout while the queue is backed up
+            if not crud.projects.transition(db, node_id, ("pending",), "pending"):
+                continue
+            deploy_project.delay(node_id)
+            recovered += 1
+    finally:
+        db.close()
+    if recovered:
+        logger.warning("Recovered %d lost deployments", recovered)
+    return recovered
@@ -3,9 +3,7 @@
 # Let the DB start
 python /app/app/backend_pre_start.py
 
-# Run migrations
-alembic upgrade head
-alembic revision --autogenerate -m "Revision"
+# Run migrations, a no-op when the database is already at head
 alembic upgrade head
 
 # Create initial data in DB
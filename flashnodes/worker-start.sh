@@ -3,4 +3,26 @@ set -e
 
 python /app/celeryworker_pre_start.py
 
-celery worker -A app.worker -l info -Q main-queue -c 1
+# WORKER_QUEUES: comma separated queues of this container, all configured queues when unset
+# WORKER_BEAT=false: leave the beat scheduler to another container when scaling out
+BEAT_FLAG="-B"
+if [ "${WORKER_BEAT:-true}" = "false" ]; then
+    BEAT_FLAG=""
+fi
+
+# Assigned first, set -e does not see a failure inside an argument's command substitution
+WORKERS=$(python -m app.core.celery_app $WORKER_QUEUES)
+
+# One worker per queue, so every queue keeps its own concurrency and prefetch multiplier
+trap 'kill -TERM $(jobs -p) 2>/dev/null; wait' TERM INT
+while read -r WORKER_OPTIONS; do
+    celery worker -A app.worker -l info $WORKER_OPTIONS $BEAT_FLAG &
+    BEAT_FLAG=""
+done <<< "$WORKERS"
+
+# Stop the container as soon as one worker exits, with its status, so it is restarted as a whole
+STATUS=0
+wait -n || STATUS=$?
+kill -TERM $(jobs -p) 2>/dev/null || true
+wait
+exit $STATUS